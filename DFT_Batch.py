@@ -0,0 +1,230 @@
+"""Runs the DFT analysis over many pieces and configurations without the notebook or the Tk dialog.
+
+Example:
+    python DFT_Batch.py --windows 4 8 16 --strategies Onset Duration --log true false --processes 4 --html
+    python DFT_Batch.py --pieces mozart/k458/movement1.mxl --verbose --profile parse=cprofile dft=tracemalloc
+    python DFT_Batch.py --windows 16 --segments --html
+"""
+import argparse
+import itertools
+import logging
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import DFT_Config as Config
+import DFT_Corpus as CP
+import DFT_Export as Export
+import DFT_Functions as Funcs
+import DFT_Graphing as Graph
+import DFT_Monitor as Monitor
+import DFT_Segment as Segment
+
+
+def result_name(piece, window, strategy, log):
+    """Builds the file name for one piece and configuration, e.g. 'mozart-k155-movement1_16beat_Duration_log'.
+
+    Arguments:
+        piece {string} -- entry from DFT_Corpus.full_corpus
+        window {int} -- window size in beats
+        strategy {string} -- option of 'Onset', 'Duration', or 'Flat'
+        log {bool} -- whether the arrays were log weighted
+
+    Returns:
+        string -- file name without extension
+    """
+    name = os.path.splitext(piece)[0].replace('sample_corpus/', '').replace('/', '-')
+    weight = 'log' if log else 'linear'
+    return f'{name}_{window}beat_{strategy}_{weight}'
+
+
+def analyze_piece(piece, configs, excerpt=None, out_dir='batch_results', use_cache=True, file_format='csv', 
+                  html=False, profile=None, segments=False):
+    """Runs every configuration for one piece, parsing the score at most once.
+
+    A failing configuration is recorded and the remaining ones still run.
+
+    Arguments:
+        piece {string} -- entry from DFT_Corpus.full_corpus
+        configs {list} -- (window, strategy, log) tuples
+
+    Keyword Arguments:
+        excerpt {tuple} -- beginning and ending measures if it is an excerpt (default: {None})
+        out_dir {string} -- folder for the result files (default: {'batch_results'})
+        use_cache {bool} -- reuse scores stored by DFT_Cache (default: {True})
+        file_format {string} -- 'csv' or 'parquet' (default: {'csv'})
+        html {bool} -- also save every panorama of each configuration with DFT_Graphing.export_panoramas 
+            (default: {False})
+        profile {dict} -- stage name to 'cprofile' or 'tracemalloc'; the reports are written next to the result 
+            files (default: {None})
+        segments {bool} -- also find the segments with DFT_Segment while the windows are written, save them to 
+            a '_segments.csv' file, and mark them in the panoramas (default: {False})
+
+    Returns:
+        list -- (piece, config, path or None, error message or None) for each configuration
+    """
+    parsed = {}
+    def parse_once(score_string, excerpt):
+        if 'score' not in parsed:
+            parsed['score'] = Funcs.parse_score(score_string=score_string, excerpt=excerpt)
+        return parsed['score']
+    # it gives what parse_score does, so excerpts of MusicXML files are still read without music21
+    parse_once.parses_like = Funcs.parse_score
+
+    outcomes = []
+    for window, strategy, log in configs:
+        try:
+            name = result_name(piece, window, strategy, log)
+            path = os.path.join(out_dir, f'{name}.{file_format}')
+            config = Config.analysis_config(piece, excerpt, window, strategy, log)
+            # an empty excerpt still gets the columns of the coefficients it would have had
+            coefficients = config.coefficients or range(1, config.edo // 2 + 1)
+            monitor = Monitor.stage_monitor(logger=Monitor.logger, profile=profile, report_dir=out_dir, name=name)
+            detector = Segment.change_detector() if segments else None
+            if html:
+                # the plots need every window at once, so the results are not chunked
+                multisets = Funcs.score_to_data(
+                    config,
+                    use_cache=use_cache,
+                    parser=parse_once,
+                    memoize=False,
+                    monitor=monitor)
+                with monitor.stage('write_results', output=path, windows=len(multisets)) as counters:
+                    Export.write_window_chunks(multisets, path, file_format=file_format, 
+                                               coefficients=coefficients)
+                    counters['bytes_written'] = os.path.getsize(path)
+                found = None
+                if detector is not None:
+                    with monitor.stage('segment', windows=len(multisets)):
+                        detector.update(multisets)
+                    found = detector.finish()
+                    write_segments(found, out_dir, name, monitor)
+                Graph.export_panoramas(
+                    Funcs.make_master_df(multisets, monitor=monitor, segments=found),
+                    savehtml=os.path.join(out_dir, name),
+                    title=f'{name.split("_")[0]}: {window}-Beat Window, {strategy}',
+                    monitor=monitor)
+            else:
+                chunks = Funcs.score_to_chunks(
+                    config,
+                    use_cache=use_cache,
+                    parser=parse_once,
+                    monitor=monitor)
+                if detector is not None:
+                    chunks = detector.follow(chunks)
+                # windows are computed while they are written, so this stage includes the windowing
+                with monitor.stage('write_results', output=path) as counters:
+                    counters['windows'] = Export.write_window_chunks(chunks, path, file_format=file_format, 
+                                                                     coefficients=coefficients)
+                    counters['bytes_written'] = os.path.getsize(path)
+                if detector is not None:
+                    write_segments(detector.finish(), out_dir, name, monitor)
+            outcomes.append((piece, (window, strategy, log), path, None))
+        except Exception:
+            outcomes.append((piece, (window, strategy, log), None, traceback.format_exc()))
+    return outcomes
+
+
+def write_segments(segments, out_dir, name, monitor):
+    """Writes the segments of one analysis next to its results, as '{name}_segments.csv'."""
+    path = os.path.join(out_dir, f'{name}_segments.csv')
+    with monitor.stage('write_segments', output=path) as counters:
+        counters['segments'] = Export.write_segments(segments, path)
+    return path
+
+
+def run_batch(pieces=None, windows=(16,), strategies=('Duration',), logs=(True,), excerpt=None,
+              out_dir='batch_results', processes=None, use_cache=True, file_format='csv', html=False, profile=None, 
+              segments=False):
+    """Analyzes every piece with every combination of window size, strategy, and log setting in a process pool.
+
+    Keyword Arguments:
+        pieces {list} -- entries from DFT_Corpus (default: {None}, which uses DFT_Corpus.full_corpus)
+        windows {list} -- window sizes in beats (default: {(16,)})
+        strategies {list} -- counting strategies (default: {('Duration',)})
+        logs {list} -- log weight settings (default: {(True,)})
+        excerpt {tuple} -- beginning and ending measures applied to every piece (default: {None})
+        out_dir {string} -- folder for the result files (default: {'batch_results'})
+        processes {int} -- number of worker processes (default: {None}, which uses one per CPU)
+        use_cache {bool} -- reuse scores stored by DFT_Cache (default: {True})
+        file_format {string} -- 'csv' or 'parquet' (default: {'csv'})
+        html {bool} -- also save every panorama, sharing one plotly.min.js in out_dir (default: {False})
+        profile {dict} -- stage name to 'cprofile' or 'tracemalloc', see analyze_piece (default: {None})
+        segments {bool} -- also save and mark the segments of every analysis, see analyze_piece (default: {False})
+
+    Returns:
+        list -- (piece, config, path or None, error message or None) for each piece and configuration
+    """
+    pieces = CP.full_corpus if pieces is None else pieces
+    configs = list(itertools.product(windows, strategies, logs))
+    os.makedirs(out_dir, exist_ok=True)
+    if html:
+        Graph.write_plotlyjs(out_dir)
+
+    outcomes = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(analyze_piece, piece, configs, excerpt, out_dir, use_cache, file_format, html, 
+                               profile, segments) : piece
+                   for piece in pieces}
+        for future in as_completed(futures):
+            try:
+                outcomes.extend(future.result())
+            except Exception:
+                error = traceback.format_exc()
+                outcomes.extend((futures[future], config, None, error) for config in configs)
+    return outcomes
+
+
+def parse_bool(value):
+    if value.lower() in ('true', 'yes', '1'):
+        return True
+    if value.lower() in ('false', 'no', '0'):
+        return False
+    raise argparse.ArgumentTypeError(f'expected true or false, got {value!r}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pieces', nargs='+', default=None,
+                        help='pieces from DFT_Corpus (default: the full corpus)')
+    parser.add_argument('--windows', nargs='+', type=int, default=[16], help='window sizes in beats')
+    parser.add_argument('--strategies', nargs='+', default=['Duration'], choices=['Duration', 'Onset', 'Flat'])
+    parser.add_argument('--log', nargs='+', type=parse_bool, default=[True], help='log weight settings')
+    parser.add_argument('--excerpt', nargs=2, type=int, default=None, metavar=('BEGIN', 'END'))
+    parser.add_argument('--out', default='batch_results', help='folder for the result files')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--format', default='csv', choices=['csv', 'parquet'], help='result file format')
+    parser.add_argument('--no-cache', action='store_true', help='always parse the scores')
+    parser.add_argument('--html', action='store_true', help='also save the panoramas as html files')
+    parser.add_argument('--segments', action='store_true', help='also find and save the segments of every analysis')
+    parser.add_argument('--verbose', action='store_true', help='log the time and counters of every stage')
+    parser.add_argument('--profile', nargs='+', default=None, metavar='STAGE=PROFILER',
+                        help="profile stages with 'cprofile' or 'tracemalloc', e.g. parse=cprofile")
+    args = parser.parse_args(argv)
+    if args.verbose:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(processName)s %(message)s')
+
+    outcomes = run_batch(
+        pieces=args.pieces,
+        windows=args.windows,
+        strategies=args.strategies,
+        logs=args.log,
+        excerpt=tuple(args.excerpt) if args.excerpt else None,
+        out_dir=args.out,
+        processes=args.processes,
+        use_cache=not args.no_cache,
+        file_format=args.format,
+        html=args.html,
+        profile=Monitor.parse_profile(args.profile),
+        segments=args.segments)
+
+    failures = [o for o in outcomes if o[3] is not None]
+    for piece, config, _, error in failures:
+        print(f'FAILED {piece} {config}:\n{error}', file=sys.stderr)
+    print(f'{len(outcomes) - len(failures)} of {len(outcomes)} analyses written to {args.out}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Times every stage of the pipeline on the sample corpus and on synthetic scores, and flags regressions.
+
+Example:
+    python DFT_Benchmark.py --out benchmark.json
+    python DFT_Benchmark.py --baseline benchmark.json --threshold 0.25
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import DFT_Corpus as CP
+import DFT_Functions as Funcs
+import DFT_Graphing as Graph
+from DFT_array_class import dft_array
+
+
+# (measures, parts, meters) of the synthetic scores, from short and plain to long with changing meters
+synthetic_cases = [(16, 2, ('4/4',)),
+                   (64, 4, ('4/4',)),
+                   (64, 8, ('3/4', '6/8', '5/8', '4/4')),
+                   (256, 4, ('3/4', '6/8', '5/8', '4/4')),
+                   (1024, 4, ('3/4', '6/8', '5/8', '4/4'))]
+quick_cases = synthetic_cases[:3]
+
+
+def synthetic_score(n_measures, n_parts, meters=('4/4',), seed=0):
+    """Builds a random score with chords, ties across barlines, and a meter change every eight measures.
+
+    Arguments:
+        n_measures {int} -- number of measures in every part
+        n_parts {int} -- number of parts
+
+    Keyword Arguments:
+        meters {tuple} -- time signatures used in turn (default: {('4/4',)})
+        seed {int} -- seed for the random notes, so every run builds the same score (default: {0})
+
+    Returns:
+        score (music21) -- the generated score
+    """
+    from music21 import chord, meter, note, stream, tie
+
+    rng = random.Random(seed)
+    score = stream.Score()
+    for part_idx in range(n_parts):
+        part = stream.Part()
+        low = 36 + 12 * (part_idx % 4)
+        tied_pitch = None
+        for number in range(1, n_measures + 1):
+            m = stream.Measure(number=number)
+            if (number - 1) % 8 == 0:
+                m.timeSignature = meter.TimeSignature(meters[(number - 1) // 8 % len(meters)])
+                bar_length = m.timeSignature.barDuration.quarterLength
+            position = 0.0
+            while position < bar_length:
+                length = min(rng.choice([0.5, 1.0, 1.0, 1.5, 2.0]), bar_length - position)
+                if tied_pitch is not None:
+                    element = note.Note(tied_pitch, quarterLength=length)
+                    element.tie = tie.Tie('stop')
+                    tied_pitch = None
+                elif rng.random() < 0.2:
+                    element = chord.Chord([low + rng.randrange(24) for _ in range(3)], quarterLength=length)
+                else:
+                    element = note.Note(low + rng.randrange(24), quarterLength=length)
+                position += length
+                if position >= bar_length and isinstance(element, note.Note) and element.tie is None \
+                        and number < n_measures and rng.random() < 0.3:
+                    element.tie = tie.Tie('start')
+                    tied_pitch = element.pitch.midi
+                m.append(element)
+            part.append(m)
+        score.insert(0, part)
+    return score
+
+
+def write_synthetic_scores(directory, cases=synthetic_cases):
+    """Writes one MusicXML file per synthetic case, so parse_score is timed on real files.
+
+    Arguments:
+        directory {string} -- folder for the files
+
+    Keyword Arguments:
+        cases {list} -- (measures, parts, meters) tuples (default: {synthetic_cases})
+
+    Returns:
+        list -- (name, path) for every case
+    """
+    scores = []
+    for n_measures, n_parts, meters in cases:
+        name = f'synthetic_{n_measures}m_{n_parts}p_{len(meters)}ts'
+        path = synthetic_score(n_measures, n_parts, meters).write('musicxml', fp=os.path.join(directory, f'{name}.xml'))
+        scores.append((name, str(path)))
+    return scores
+
+
+def measure(function, repeat=3):
+    """Runs a function several times and measures its fastest wall time and its peak memory.
+
+    The memory is measured in a separate run under tracemalloc, which slows Python down.
+
+    Arguments:
+        function {function} -- called without arguments
+
+    Keyword Arguments:
+        repeat {int} -- number of timed runs (default: {3})
+
+    Returns:
+        tuple -- (result of the last run, {'seconds' : fastest time, 'peak_bytes' : peak memory allocated})
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, {'seconds' : min(times), 'peak_bytes' : peak}
+
+
+def measure_import():
+    """Times importing the modules in a fresh interpreter, where nothing is imported yet.
+
+    Returns:
+        dict -- {'seconds' : import time, 'peak_bytes' : peak memory allocated by the imports}
+    """
+    code = ('import time, tracemalloc; tracemalloc.start(); start = time.perf_counter(); '
+            'import DFT_Functions, DFT_Graphing, DFT_Batch; '
+            'print(time.perf_counter() - start, tracemalloc.get_traced_memory()[1])')
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    seconds, peak = output.split()
+    return {'seconds' : float(seconds), 'peak_bytes' : int(peak)}
+
+
+def benchmark_score(path, window=16, strategy='Duration', repeat=3, n_dft_arrays=1000):
+    """Measures every stage of the pipeline for one score.
+
+    Arguments:
+        path {string} -- local score file or entry from DFT_Corpus
+
+    Keyword Arguments:
+        window {int} -- window size in beats (default: {16})
+        strategy {string} -- option of 'Onset', 'Duration', or 'Flat' (default: {'Duration'})
+        repeat {int} -- number of timed runs of each stage (default: {3})
+        n_dft_arrays {int} -- number of windows transformed one by one with dft_array (default: {1000})
+
+    Returns:
+        dict -- stage name to {'seconds', 'peak_bytes'}, plus the size of the score under 'counts'
+    """
+    results = {}
+    parsed, results['parse_score'] = measure(lambda: Funcs.parse_score(path), repeat=1)
+    _, results['beat_offsets'] = measure(lambda: Funcs.get_beat_offsets_from_score(parsed.parts[0]), repeat)
+    score_data, results['extract_score_data'] = measure(lambda: Funcs.extract_score_data(parsed, strategy), repeat)
+
+    def windows():
+        multisets = Funcs.sliding_window(
+            events=score_data['events'],
+            measure_index=score_data['measure_index'],
+            beat_offset_list=score_data['beat_offsets'],
+            window_size=window,
+            strategy=strategy)
+        return multisets.compute()
+    multisets, results['sliding_window'] = measure(windows, repeat)
+
+    def single_arrays():
+        for row, measure_range in zip(multisets.windows[:n_dft_arrays], multisets.measure_ranges[:n_dft_arrays]):
+            array = dft_array(row, measure_range)
+            array.mag_dict()
+            array.phase_dict()
+    _, results['dft_array'] = measure(single_arrays, repeat)
+    master_df, results['master_df'] = measure(lambda: Funcs.make_master_df(multisets), repeat)
+
+    def figures():
+        traces = Graph.panorama_traces(master_df)
+        Graph.panorama_figure(traces)
+        Graph.individual_figure(traces, 5)
+        Graph.magnitudes_figure(traces)
+    _, results['graphing'] = measure(figures, repeat)
+
+    results['counts'] = {'beats' : len(score_data['beat_offsets']) - 1,
+                         'notes' : len(score_data['events']['onset']),
+                         'windows' : len(multisets)}
+    return results
+
+
+def run_benchmarks(quick=False, corpus=True, repeat=3):
+    """Measures every stage on the sample corpus and the synthetic scores, without network access.
+
+    Keyword Arguments:
+        quick {bool} -- only the three smallest synthetic scores (default: {False})
+        corpus {bool} -- include the scores in DFT_Corpus.local_corpus (default: {True})
+        repeat {int} -- number of timed runs of each stage (default: {3})
+
+    Returns:
+        dict -- 'meta' (versions, platform, date) and 'results' (score name to stage name to measurements, with 
+            the import time under 'modules')
+    """
+    import music21
+
+    results = {'modules' : {'import' : measure_import()}}
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic = write_synthetic_scores(directory, quick_cases if quick else synthetic_cases)
+        # untimed run, so that modules imported on first use (pandas, plotly) are not counted in the first score
+        benchmark_score(synthetic[0][1], repeat=1)
+        scores = synthetic
+        if corpus:
+            scores = [(os.path.splitext(os.path.basename(p))[0], p) for p in CP.local_corpus] + synthetic
+        for name, path in scores:
+            results[name] = benchmark_score(path, repeat=repeat)
+
+    meta = {'date' : datetime.datetime.now().isoformat(timespec='seconds'),
+            'python' : platform.python_version(),
+            'platform' : platform.platform(),
+            'numpy' : np.__version__,
+            'music21' : music21.__version__,
+            'quick' : quick}
+    return {'meta' : meta, 'results' : results}
+
+
+def find_regressions(current, baseline, threshold=0.25, min_seconds=0.001):
+    """Compares two benchmark runs and lists every stage that got slower or bigger by more than the threshold.
+
+    Arguments:
+        current {dict} -- output of run_benchmarks
+        baseline {dict} -- earlier output of run_benchmarks, e.g. read back from its JSON file
+
+    Keyword Arguments:
+        threshold {float} -- allowed relative increase, e.g. 0.25 for 25% (default: {0.25})
+        min_seconds {float} -- times below this are too noisy to compare (default: {0.001})
+
+    Returns:
+        list -- (score, stage, metric, baseline value, current value) for every regression
+    """
+    regressions = []
+    for name, stage_results in current['results'].items():
+        old_results = baseline['results'].get(name, {})
+        for stage, values in stage_results.items():
+            old_values = old_results.get(stage)
+            if stage == 'counts' or not old_values:
+                continue
+            for metric in ('seconds', 'peak_bytes'):
+                old, new = old_values.get(metric), values.get(metric)
+                if old is None or new is None or (metric == 'seconds' and max(old, new) < min_seconds):
+                    continue
+                if new > old * (1 + threshold):
+                    regressions.append((name, stage, metric, old, new))
+    return regressions
+
+
+def format_report(benchmarks):
+    """Lays out the results as a table with one line per score and stage.
+
+    Arguments:
+        benchmarks {dict} -- output of run_benchmarks
+
+    Returns:
+        string -- the table
+    """
+    lines = [f'{"score":<32} {"stage":<20} {"seconds":>10} {"peak MB":>10}']
+    for name, stage_results in benchmarks['results'].items():
+        for stage, values in stage_results.items():
+            if stage != 'counts':
+                lines.append(f'{name:<32} {stage:<20} {values["seconds"]:>10.4f} {values["peak_bytes"] / 1024**2:>10.2f}')
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default=None, help='JSON file for the results')
+    parser.add_argument('--baseline', default=None, help='JSON file from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown (default: 0.25)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage; the fastest is kept')
+    parser.add_argument('--quick', action='store_true', help='only the smallest synthetic scores')
+    parser.add_argument('--no-corpus', action='store_true', help='skip the scores in sample_corpus')
+    args = parser.parse_args(argv)
+
+    benchmarks = run_benchmarks(quick=args.quick, corpus=not args.no_corpus, repeat=args.repeat)
+    print(format_report(benchmarks))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(benchmarks, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(benchmarks, baseline, threshold=args.threshold)
+        for name, stage, metric, old, new in regressions:
+            print(f'REGRESSION {name} {stage} {metric}: {old:.6g} -> {new:.6g}', file=sys.stderr)
+        print(f'{len(regressions)} regressions beyond {args.threshold:.0%}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
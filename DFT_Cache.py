@@ -0,0 +1,247 @@
+import hashlib
+import importlib.util
+import io
+import os
+import zipfile
+from collections import OrderedDict
+
+import numpy as np
+
+import DFT_Corpus as CP
+
+
+cache_dir = os.environ.get('DFT_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'DFT_Panorama'))
+max_cache_bytes = 512 * 1024**2
+max_memory_entries = 32
+
+# bump whenever the layout or the meaning of the stored score data changes
+cache_version = 6
+
+
+# (path, modification time, size) to the hash of the file, so unchanged files are read once per process
+file_hashes = {}
+
+
+def corpus_root():
+    """Finds music21's corpus folder without importing music21, which takes seconds.
+
+    Returns:
+        string -- path to the corpus folder, or None if music21 is not installed
+    """
+    spec = importlib.util.find_spec('music21')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return os.path.join(list(spec.submodule_search_locations)[0], 'corpus')
+
+
+def source_path(score_string):
+    """Finds the file on disk behind a repertoire entry.
+
+    Arguments:
+        score_string {string} -- entry from DFT_Corpus.full_corpus
+
+    Returns:
+        string -- path to the encoded score
+    """
+    if score_string in CP.music21_corpus:
+        root = corpus_root()
+        path = os.path.join(root, score_string) if root else score_string
+        if not os.path.exists(path):
+            # e.g. a corpus installed elsewhere, which only music21 knows about
+            from music21 import corpus
+            path = str(corpus.getWork(score_string))
+        return path
+    return score_string
+
+
+def file_hash(path):
+    """Hashes the contents of a file. The hash is kept until the file's modification time or size changes.
+
+    Arguments:
+        path {string} -- path to file
+
+    Returns:
+        string -- hex digest of the file contents
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024**2), b''):
+                digest.update(block)
+        file_hashes[key] = digest.hexdigest()
+    return file_hashes[key]
+
+
+def cache_key(score_string, excerpt, variant):
+    """Builds the cache file name for a score, excerpt, and kind of note-event table.
+
+    The name starts with an id for the source and the hash of its contents, so entries for an edited
+    file can be recognized and replaced.
+
+    Arguments:
+        score_string {string} -- entry from DFT_Corpus.full_corpus
+        excerpt {tuple} -- beginning and ending measures if it is an excerpt
+        variant {string} -- kind of note-event table, from DFT_Functions.score_variant
+
+    Returns:
+        string -- cache file name
+    """
+    source_id = hashlib.sha1(score_string.encode()).hexdigest()[:16]
+    content_id = file_hash(source_path(score_string))[:16]
+    excerpt_id = '-'.join(str(m) for m in excerpt) if excerpt else 'full'
+    return f'{source_id}_{content_id}_{excerpt_id}_{variant}_v{cache_version}.npz'
+
+
+def load(key, directory=None):
+    """Reads cached score data and marks it as recently used.
+
+    Arguments:
+        key {string} -- cache file name from cache_key
+
+    Keyword Arguments:
+        directory {string} -- cache location (default: {None}, which uses cache_dir)
+
+    Returns:
+        dict -- the stored score data, or None if it is not cached
+    """
+    path = os.path.join(directory or cache_dir, key)
+    try:
+        with np.load(path) as npz:
+            flat = {name : npz[name] for name in npz.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+    os.utime(path)
+
+    data = {}
+    for name, array in flat.items():
+        group, _, field = name.partition('.')
+        if field:
+            data.setdefault(group, {})[field] = array
+        else:
+            data[group] = array
+    return data
+
+
+def store(key, data, directory=None, max_bytes=None):
+    """Writes score data to the cache, replaces stale entries for the same source, and evicts the least recently used entries.
+
+    Arguments:
+        key {string} -- cache file name from cache_key
+        data {dict} -- numpy arrays, or dicts of numpy arrays, to store
+
+    Keyword Arguments:
+        directory {string} -- cache location (default: {None}, which uses cache_dir)
+        max_bytes {int} -- size limit for the whole cache (default: {None}, which uses max_cache_bytes)
+
+    Returns:
+        int -- number of bytes written
+    """
+    directory = directory or cache_dir
+    os.makedirs(directory, exist_ok=True)
+
+    flat = {}
+    for group, value in data.items():
+        if isinstance(value, dict):
+            flat.update({f'{group}.{field}' : array for field, array in value.items()})
+        else:
+            flat[group] = value
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **flat)
+
+    path = os.path.join(directory, key)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(buffer.getvalue())
+    os.replace(temp_path, path)
+
+    source_id, content_id = key.split('_')[:2]
+    for name in os.listdir(directory):
+        if name.startswith(f'{source_id}_') and not name.startswith(f'{source_id}_{content_id}_'):
+            _remove(os.path.join(directory, name))
+
+    evict(directory=directory, max_bytes=max_bytes)
+    return buffer.getbuffer().nbytes
+
+
+def evict(directory=None, max_bytes=None):
+    """Deletes the least recently used cache entries until the cache fits its size limit.
+
+    Keyword Arguments:
+        directory {string} -- cache location (default: {None}, which uses cache_dir)
+        max_bytes {int} -- size limit for the whole cache (default: {None}, which uses max_cache_bytes)
+    """
+    directory = directory or cache_dir
+    max_bytes = max_cache_bytes if max_bytes is None else max_bytes
+    if not os.path.isdir(directory):
+        return
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith('.npz'):
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        _remove(os.path.join(directory, name))
+        total -= size
+
+
+def clear(directory=None):
+    """Deletes every cache entry.
+
+    Keyword Arguments:
+        directory {string} -- cache location (default: {None}, which uses cache_dir)
+    """
+    evict(directory=directory, max_bytes=0)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class memory_cache(object):
+    """Keeps the most recently used results in memory, evicting the least recently used beyond a fixed number of entries.
+
+    Keyword Arguments:
+        max_entries {int} -- number of entries kept (default: {None}, which uses max_memory_entries)
+    """
+    def __init__(self, max_entries=None):
+        self.max_entries = max_memory_entries if max_entries is None else max_entries
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        """Returns the entry for key and marks it as recently used, or None if it is not kept."""
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        """Keeps value under key and evicts the least recently used entries past max_entries."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > max(self.max_entries, 0):
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# score data and results of the current session, used by DFT_Functions.score_to_data
+memory = memory_cache()
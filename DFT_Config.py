@@ -0,0 +1,105 @@
+import json
+import os
+from dataclasses import asdict, dataclass, fields
+
+import DFT_Corpus as CP
+
+
+strategies = ['Duration', 'Onset', 'Flat']
+
+
+@dataclass
+class analysis_config:
+    """All user inputs for one analysis. Unpacks like the (repertoire, excerpt, window, strategy, log) tuple.
+
+    edo divides the octave into that many pitch classes, and coefficients picks the Fourier coefficients to 
+    compute (None for 1 to edo // 2).
+    """
+    repertoire: str = CP.full_corpus[0]
+    excerpt: tuple = None
+    window: int = 16
+    strategy: str = 'Duration'
+    log: bool = True
+    edo: int = 12
+    coefficients: tuple = None
+
+    def __post_init__(self):
+        self.excerpt = tuple(int(m) for m in self.excerpt) if self.excerpt else None
+        if self.excerpt is not None and len(self.excerpt) != 2:
+            raise ValueError(f'excerpt must be a beginning and ending measure, got {self.excerpt}')
+        self.window = int(self.window)
+        if self.window < 1:
+            raise ValueError(f'window must be at least one beat, got {self.window}')
+        if self.strategy not in strategies:
+            raise ValueError(f'strategy must be one of {strategies}, got {self.strategy!r}')
+        self.log = bool(self.log)
+        self.edo = int(self.edo)
+        if self.edo < 1:
+            raise ValueError(f'edo must be at least 1, got {self.edo}')
+        if self.coefficients is not None:
+            self.coefficients = tuple(int(c) for c in self.coefficients)
+            if not all(0 <= c < self.edo for c in self.coefficients):
+                raise ValueError(f'coefficients must be between 0 and {self.edo - 1}, got {self.coefficients}')
+
+    def __iter__(self):
+        return iter((self.repertoire, self.excerpt, self.window, self.strategy, self.log))
+
+    @classmethod
+    def from_dict(cls, values):
+        """Builds a config from a dictionary such as the one returned by the Tk dialog.
+
+        Arguments:
+            values {dict} -- any of 'repertoire', 'excerpt', 'window', 'strategy', 'log', 'edo', and 'coefficients'
+
+        Returns:
+            analysis_config -- the config
+        """
+        unknown = set(values) - {f.name for f in fields(cls)}
+        if unknown:
+            raise ValueError(f'unknown config keys: {sorted(unknown)}')
+        return cls(**values)
+
+    @classmethod
+    def from_file(cls, path):
+        """Reads a config from a JSON or TOML file.
+
+        Arguments:
+            path {string} -- location of the .json or .toml file
+
+        Returns:
+            analysis_config -- the config
+        """
+        if os.path.splitext(path)[1].lower() == '.toml':
+            try:
+                import tomllib
+            except ImportError:
+                import tomli as tomllib
+            with open(path, 'rb') as f:
+                return cls.from_dict(tomllib.load(f))
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_file(self, path):
+        """Writes the config as JSON.
+
+        Arguments:
+            path {string} -- location of the .json file
+        """
+        with open(path, 'w') as f:
+            json.dump(asdict(self), f, indent=4)
+
+
+def as_config(config):
+    """Accepts an analysis_config, a dictionary of user inputs, or a (repertoire, excerpt, window, strategy, log) tuple.
+
+    Arguments:
+        config {analysis_config, dict, or tuple} -- all user inputs
+
+    Returns:
+        analysis_config -- the config
+    """
+    if isinstance(config, analysis_config):
+        return config
+    if isinstance(config, dict):
+        return analysis_config.from_dict(config)
+    return analysis_config(*config)
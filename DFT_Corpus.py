@@ -1,5 +1,3 @@
-from music21 import corpus
-
 music21_corpus = ['mozart/k155/movement1.mxl', 'mozart/k156/movement1.mxl', 
                   'mozart/k458/movement1.mxl', 'bach/bwv244.10.mxl', 'bach/bwv244.15.mxl', 'bach/bwv244.17.mxl', 'beethoven/opus18no1/movement1.mxl', 'beethoven/opus18no1/movement2.mxl']
 
@@ -0,0 +1,152 @@
+import csv
+import os
+
+
+def window_columns(coefficients=range(1, 7)):
+    """Lists the columns written for every window.
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients in the results (default: {range(1, 7)})
+
+    Returns:
+        list -- column names
+    """
+    return (['Window Number', 'Start Measure', 'End Measure', 'Original Array']
+            + [f'f{i} Magnitude' for i in coefficients]
+            + [f'f{i} Phase' for i in coefficients]
+            + [f'f{i} Quantized Phase' for i in coefficients])
+
+
+def chunk_columns(chunk):
+    """Lays out one chunk of windows as columns.
+
+    Arguments:
+        chunk {dft_matrix} -- windows from sliding_window or iter_sliding_window
+
+    Returns:
+        dict -- column name to list of values, in the order of window_columns(chunk.coefficients)
+    """
+    columns = {'Window Number' : chunk.window_numbers().tolist(),
+               'Start Measure' : chunk.measure_ranges[:, 0].tolist(),
+               'End Measure' : chunk.measure_ranges[:, 1].tolist(),
+               'Original Array' : [' '.join(f'{x:g}' for x in row) for row in chunk.windows]}
+    for name, matrix in [('Magnitude', chunk.magnitudes), ('Phase', chunk.phases),
+                         ('Quantized Phase', chunk.quantized_phases)]:
+        for j, i in enumerate(chunk.coefficients):
+            columns[f'f{i} {name}'] = matrix[:, j].tolist()
+    return columns
+
+
+def write_csv_chunks(chunks, path, coefficients=range(1, 7)):
+    """Appends each chunk to a csv file as soon as it is produced.
+
+    Arguments:
+        chunks {iterable} -- dft_matrix chunks, e.g. from score_to_chunks
+        path {string} -- location of the csv file
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients for the header when there are no chunks 
+            (default: {range(1, 7)})
+
+    Returns:
+        int -- number of windows written
+    """
+    n_rows = 0
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        for chunk in chunks:
+            columns = chunk_columns(chunk)
+            if n_rows == 0:
+                writer.writerow(columns)
+            writer.writerows(zip(*columns.values()))
+            n_rows += len(chunk)
+        if n_rows == 0:
+            writer.writerow(window_columns(coefficients))
+    return n_rows
+
+
+def write_parquet_chunks(chunks, path, coefficients=range(1, 7)):
+    """Appends each chunk to a Parquet file as its own row group. Requires pyarrow.
+
+    Arguments:
+        chunks {iterable} -- dft_matrix chunks, e.g. from score_to_chunks
+        path {string} -- location of the parquet file
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients for the schema when there are no chunks 
+            (default: {range(1, 7)})
+
+    Returns:
+        int -- number of windows written
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('writing Parquet files requires pyarrow (pip install pyarrow)')
+
+    def make_schema(coefficients):
+        return pa.schema(
+            [('Window Number', pa.int64()), ('Start Measure', pa.int64()), ('End Measure', pa.int64()),
+             ('Original Array', pa.string())]
+            + [(name, pa.float64()) for name in window_columns(coefficients)[4:]])
+
+    # the columns depend on the coefficients of the results, so the file is opened with the first chunk
+    writer = None
+    n_rows = 0
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = make_schema(chunk.coefficients)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.table(chunk_columns(chunk), schema=schema))
+            n_rows += len(chunk)
+        if writer is None:
+            writer = pq.ParquetWriter(path, make_schema(coefficients))
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+def write_window_chunks(chunks, path, file_format=None, coefficients=range(1, 7)):
+    """Writes chunks of windows to csv or Parquet without holding more than one chunk in memory.
+
+    Arguments:
+        chunks {iterable} -- dft_matrix chunks, e.g. from score_to_chunks; a single dft_matrix also works
+        path {string} -- location of the output file
+
+    Keyword Arguments:
+        file_format {string} -- 'csv' or 'parquet' (default: {None}, which uses the file extension)
+        coefficients {list} -- Fourier coefficients of the columns when there are no chunks; chunks bring their 
+            own (default: {range(1, 7)})
+
+    Returns:
+        int -- number of windows written
+    """
+    if hasattr(chunks, 'windows'):
+        chunks = [chunks]
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip('.').lower() or 'csv'
+    if file_format == 'csv':
+        return write_csv_chunks(chunks, path, coefficients)
+    if file_format == 'parquet':
+        return write_parquet_chunks(chunks, path, coefficients)
+    raise ValueError(f"file_format must be 'csv' or 'parquet', got {file_format!r}")
+
+
+def write_segments(segments, path):
+    """Writes the segments of a piece to a csv file, one row per segment.
+
+    Arguments:
+        segments {list} -- segments from DFT_Segment.find_segments
+        path {string} -- location of the csv file
+
+    Returns:
+        int -- number of segments written
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Segment', 'First Window', 'Last Window', 'Start Measure', 'End Measure'])
+        writer.writerows(segments)
+    return len(segments)
@@ -1,14 +1,24 @@
 
-from music21 import stream, note, pitch, chord, meter, corpus, converter
+import bisect
+import itertools
+from functools import lru_cache
+
 import numpy as np
 
+import DFT_Cache as Cache
+import DFT_Config as Config
 import DFT_Corpus as CP
-from DFT_array_class import dft_array
+import DFT_Monitor as Monitor
+import DFT_MusicXML as MusicXML
+import DFT_Segment as Segment
+from DFT_array_class import dft_matrix, part_matrix
 
 
 def quantize_array(array, quant=12):
     """Quantizes the values of an array to the nearest of 12 "nodes."
 
+    For n-EDO results pass quant=n (dft_matrix.quant), so the nodes are the positions of the n pitch classes.
+
     Arguments:
         array {numpy array} -- Numpy array with the phase values for each component
 
@@ -21,13 +31,143 @@ def quantize_array(array, quant=12):
     spacing = 360/quant
     q = np.around(array/spacing)
     return q * spacing
+
+
+def format_rows(matrix):
+    """Formats each row of a matrix exactly as str() prints a numpy array, without calling str() once per row.
+
+    Every distinct value is formatted once and the rows are padded and wrapped the way numpy does it. Rows that 
+    numpy would print in scientific notation, or non-default print options, fall back to str().
+
+    Arguments:
+        matrix {numpy array} -- 2D array with one row per window
+
+    Returns:
+        list -- one string per row
+    """
+    if len(matrix) == 0:
+        return []
+    rows, row_idx = np.unique(matrix, axis=0, return_inverse=True)
+    options = np.get_printoptions()
+    if (options['floatmode'] != 'maxprec' or options['suppress'] or options['sign'] != '-' 
+            or options['legacy'] is not False or options.get('formatter') is not None 
+            or rows.shape[1] > options['threshold']):
+        return [str(row) for row in matrix]
+
+    finite = np.isfinite(rows)
+    filled = np.where(finite, rows, 0).astype(rows.dtype)
+    # unique on the bit patterns keeps -0. apart from 0.
+    bits, value_idx = np.unique(filled.view(f'u{filled.itemsize}'), return_inverse=True)
+    value_idx = value_idx.reshape(rows.shape)
+    cores = [np.format_float_positional(v, precision=options['precision'], unique=True, trim='.') 
+             for v in bits.view(rows.dtype)]
+    int_len = np.array([c.index('.') for c in cores])
+    frac_len = np.array([len(c) - c.index('.') - 1 for c in cores])
+
+    pad_left = np.where(finite, int_len[value_idx], 0).max(axis=1)
+    pad_right = np.where(finite, frac_len[value_idx], 0).max(axis=1)
+    inf_len = len(options['infstr']) + np.isneginf(rows).any(axis=1)
+    non_finite_len = np.maximum(len(options['nanstr']), inf_len) - pad_right - 1
+    pad_left = np.where(finite.all(axis=1), pad_left, np.maximum(pad_left, non_finite_len))
+    width = pad_left + pad_right + 1
+    per_line = np.maximum(options['linewidth'] // (width + 1), 1)
+
+    absolute = np.abs(filled)
+    nonzero = absolute != 0
+    max_val = np.where(nonzero, absolute, 0).max(axis=1)
+    min_val = np.where(nonzero, absolute, np.inf).min(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exp_format = nonzero.any(axis=1) & ((max_val >= 1e8) | (min_val < 0.0001) | (max_val / min_val > 1000.))
+
+    strings = []
+    for r, row in enumerate(rows):
+        if exp_format[r]:
+            strings.append(str(row))
+            continue
+        words = []
+        for value, is_finite, v in zip(row, finite[r], value_idx[r]):
+            if is_finite:
+                word = cores[v] + ' '*(pad_right[r] - frac_len[v])
+            elif np.isnan(value):
+                word = options['nanstr']
+            else:
+                word = options['infstr'] if value > 0 else '-' + options['infstr']
+            words.append(word.rjust(width[r]))
+        lines = [' '.join(words[i:i + per_line[r]]) for i in range(0, len(words), per_line[r])]
+        strings.append('[' + '\n '.join([line.rstrip() for line in lines[:-1]] + lines[-1:]) + ']')
+    return [strings[i] for i in row_idx.reshape(-1).tolist()]
+
+
+def make_master_df(multisets, monitor=None, segments=None):
+    """Builds the master DataFrame used for evaluating and graphing the data straight from the batched results.
+
+    The columns are grouped under 'General', 'Magnitudes', 'Phases', and 'QuantizedPhases'. With segments, 
+    'General' also has the 'Segment' of every window and the 'Segment Range' of its measures, which the 
+    DFT_Graphing panoramas mark.
+
+    Arguments:
+        multisets {dft_matrix} -- all multisets from score_to_data, or one chunk from score_to_chunks
+
+    Keyword Arguments:
+        monitor {stage_monitor} -- receives the 'dataframe' stage, see DFT_Monitor (default: {None})
+        segments {list} -- segments of the piece from DFT_Segment.find_segments (default: {None})
+
+    Returns:
+        DataFrame (pandas) -- one row per window
+    """
+    import pandas as pd
+
+    monitor = monitor or Monitor.stage_monitor()
+    with monitor.stage('dataframe', windows=len(multisets)):
+        with np.errstate(divide='ignore'):
+            weighted = np.around(np.log2(multisets.windows), decimals=2)
+        general_df = pd.DataFrame({
+            'Window Number' : multisets.window_numbers(),
+            'Weighted Array' : format_rows(weighted),
+            'Original Array' : format_rows(np.around(multisets.windows, decimals=2)),
+            'Measure Range' : [f'Measures {start}–{end}' for start, end in multisets.measure_ranges.tolist()]})
+        if segments is not None:
+            numbers = Segment.segment_numbers(segments, multisets.window_numbers())
+            ranges = [''] + [f'Measures {start}–{end}' for _, _, _, start, end in segments]
+            general_df['Segment'] = numbers
+            general_df['Segment Range'] = [ranges[n] for n in numbers.tolist()]
+
+        coefficients = multisets.coefficients
+        mag_df = pd.DataFrame(multisets.magnitudes, columns=[f'f{i} Magnitude' for i in coefficients])
+        phase_df = pd.DataFrame(multisets.phases, columns=[f'f{i} Phase' for i in coefficients])
+        quant_phase_df = pd.DataFrame(
+            quantize_array(multisets.phases, quant=multisets.quant), 
+            columns=[f'f{i} Quantized Phase' for i in coefficients])
+
+        return pd.concat(dict(General = general_df, Magnitudes = mag_df, Phases = phase_df, QuantizedPhases = quant_phase_df), axis=1)
   
 
+def make_part_dfs(multisets, part_names=None, monitor=None, segments=None):
+    """Builds the master DataFrame of every part and of all parts together.
+
+    Arguments:
+        multisets {part_matrix} -- multisets from score_to_parts
+
+    Keyword Arguments:
+        part_names {list} -- name of every part (default: {None}, which uses 'Part 1', 'Part 2', ...)
+        monitor {stage_monitor} -- receives one 'dataframe' stage per DataFrame, see DFT_Monitor (default: {None})
+        segments {list} -- segments from DFT_Segment.find_segments, e.g. of multisets.total (default: {None})
+
+    Returns:
+        dict -- part name to DataFrame, ending with 'All Parts', for DFT_Graphing.parts_panorama
+    """
+    part_names = part_names or [f'Part {i + 1}' for i in range(multisets.n_parts)]
+    part_dfs = {name : make_master_df(multisets.part(idx), monitor=monitor, segments=segments) 
+                for idx, name in enumerate(part_names)}
+    part_dfs['All Parts'] = make_master_df(multisets.total, monitor=monitor, segments=segments)
+    return part_dfs
+
+
 def parse_score(score_string, excerpt=None):
     """Converts an encoded musical score into a music21 stream object.
 
     Arguments:
-        score_string {string} -- path to file
+        score_string {string} -- entry from DFT_Corpus, or path to any other score file
 
     Keyword Arguments:
         excerpt {tuple} -- beginning and ending measures if it is an excerpt (default: {None})
@@ -35,9 +175,11 @@ def parse_score(score_string, excerpt=None):
     Returns:
         stream -- music21 stream object
     """
+    from music21 import corpus, converter
+
     if score_string in CP.music21_corpus:
         working_score = corpus.parse(score_string)
-    elif score_string in CP.local_corpus:
+    else:
         working_score = converter.parse(score_string)
 
     if excerpt:
@@ -63,24 +205,75 @@ def split_time_signature(numerator):
         return [3, *split_time_signature(numerator-3)]
 
 
-def convert_time_signature(ts):
-    """Changes a time signature object to a meter sequence object.
+@lru_cache(maxsize=None)
+def meter_sequence(ratio_string):
+    """Builds the meter sequence of a time signature, divided into beat groupings. Each ratio string is only 
+    built once; the result is shared, so copy it before changing it.
 
     Arguments:
-        ts {time signature (music21)} -- music21 time signature object
+        ratio_string {string} -- ratio string of a music21 time signature, e.g. '6/8'
 
     Returns:
         meter sequence (music21) -- music21 meter sequence object divided into beat groupings
     """
-    ms = meter.MeterSequence(ts.ratioString)
+    from music21 import meter
+
+    ms = meter.MeterSequence(ratio_string)
     if ms.numerator in [2, 3, 4]:
         ms.partitionByCount(ms.numerator)
     else:
-        partition_list = split_time_signature(ts.numerator)
+        partition_list = split_time_signature(ms.numerator)
         ms.partitionByList(partition_list)
     return ms
 
 
+def convert_time_signature(ts):
+    """Changes a time signature object to a meter sequence object.
+
+    Arguments:
+        ts {time signature (music21)} -- music21 time signature object
+
+    Returns:
+        meter sequence (music21) -- music21 meter sequence object divided into beat groupings, shared by every 
+            time signature with the same ratio string (see meter_sequence)
+    """
+    return meter_sequence(ts.ratioString)
+
+
+@lru_cache(maxsize=None)
+def beat_lengths(ratio_string):
+    """Lists the length of every beat of a time signature.
+
+    Arguments:
+        ratio_string {string} -- ratio string of a music21 time signature, e.g. '6/8'
+
+    Returns:
+        tuple -- quarter-length of each beat grouping of meter_sequence(ratio_string)
+    """
+    return tuple(m.duration.quarterLength for m in meter_sequence(ratio_string))
+
+
+def get_measure_time_signatures(score):
+    """Pairs every measure with the time signature in effect, carrying the last one forward instead of searching 
+    the stream for it in every measure without its own.
+
+    Arguments:
+        score {stream (music21)} -- music21 stream object
+
+    Yields:
+        tuple -- measure and its time signature (music21)
+    """
+    from music21 import meter
+
+    ts = None
+    for m in score.semiFlat.getElementsByClass('Measure'):
+        if m.timeSignature is not None:
+            ts = m.timeSignature
+        elif ts is None:
+            ts = m.getContextByClass('TimeSignature') or meter.TimeSignature()
+        yield m, ts
+
+
 def get_beat_offsets_from_score(score):
     """Finds the offset of every beat in the score.
 
@@ -88,26 +281,27 @@ def get_beat_offsets_from_score(score):
         score {stream (music21)} -- music21 string object
 
     Returns:
-        list -- list of all offsets that are beats
+        numpy array -- offsets of all beats, followed by the end of the last beat
     """
-    time_signature_list = []
-    meter_sequence_list = []
-    offset_list = [0]
-    for m in score.semiFlat.getElementsByClass('Measure'):
-        if m.timeSignature is not None:
-            time_signature_list.append(m.timeSignature)
-        else:
-            time_signature_list.append(m.getContextByClass('TimeSignature'))
-        
-    for ts in time_signature_list:
-        meter_sequence_list.extend(convert_time_signature(ts))
-        
-    duration_list = [m.duration for m in meter_sequence_list]
-
-    for idx, i in enumerate(duration_list):
-        offset_list.append(i.quarterLength + offset_list[idx])
-    
-    return offset_list
+    lengths = []
+    for _, ts in get_measure_time_signatures(score):
+        lengths.extend(beat_lengths(ts.ratioString))
+    return np.array(list(itertools.accumulate(lengths, initial=0)), dtype=float)
+
+
+def get_beat_measure_numbers(score):
+    """Finds the number of the measure that each beat from get_beat_offsets_from_score belongs to.
+
+    Arguments:
+        score {stream (music21)} -- music21 stream object
+
+    Returns:
+        list -- measure number of every beat
+    """
+    numbers = []
+    for m, ts in get_measure_time_signatures(score):
+        numbers.extend([m.number] * len(beat_lengths(ts.ratioString)))
+    return numbers
 
 
 def update_array(array, note_, strategy):
@@ -143,13 +337,287 @@ def get_measure_number(score, offset):
     beat_measure_tuple = score.beatAndMeasureFromOffset(offset)
     measure_number = beat_measure_tuple[1].number
     return measure_number
-    
-    
-def sliding_window(score, beat_offset_list, window_size, strategy, log=True, edo=12):
-    """Runs the sliding window across the score and generates arrays of pitch classes to be used as DFT inputs.
+
+
+def build_measure_index(score):
+    """Records the start offset and number of every measure so measure numbers can be found without searching the score.
+
+    Pickups and measures with a number suffix take the number of the measure before them, as in beatAndMeasureFromOffset.
+
+    Arguments:
+        score {stream (music21)} -- music21 stream object containing measures (e.g. a part)
+
+    Returns:
+        dict -- numpy arrays 'offset' and 'number', one entry per distinct measure start, sorted by offset
+    """
+    measures = list(score.getElementsByClass('Measure'))
+    return make_measure_index(
+        offsets=[m.offset for m in measures], 
+        numbers=[m.number for m in measures], 
+        suffixes=[bool(m.numberSuffix) for m in measures])
+
+
+def make_measure_index(offsets, numbers, suffixes):
+    """Builds the measure index of build_measure_index from the offset, number, and number suffix of every measure.
+
+    Arguments:
+        offsets {list} -- start offset of every measure, in score order
+        numbers {list} -- number of every measure
+        suffixes {list} -- whether the number of each measure has a suffix (e.g. 12a)
+
+    Returns:
+        dict -- see build_measure_index
+    """
+    index_offsets, index_numbers = [], []
+    for offset, number, suffix in zip(offsets, numbers, suffixes):
+        index_number = number
+        if (suffix or number == 0) and index_offsets and index_offsets[-1] < offset:
+            index_number = previous_number
+        previous_number = number
+        index_offsets.append(float(offset))
+        index_numbers.append(index_number)
+
+    index_offsets, first_idx = np.unique(np.array(index_offsets, dtype=float), return_index=True)
+    return {'offset' : index_offsets,
+            'number' : np.array(index_numbers, dtype=int)[first_idx]}
+
+
+def get_part_measures(score):
+    """Lists every measure of every part, so that excerpts can be cut out of the extracted score data.
 
     Arguments:
         score {stream (music21)} -- music21 stream object
+
+    Returns:
+        dict -- numpy arrays 'part', 'number', 'suffix', and 'offset' (from the beginning of the score), one 
+            entry per measure in score order
+    """
+    if score.hasPartLikeStreams():
+        parts = [(float(score.elementOffset(p)), p) for p in score.parts]
+    else:
+        parts = [(0.0, score)]
+
+    part_ids, numbers, suffixes, offsets = [], [], [], []
+    for part_idx, (part_offset, part) in enumerate(parts):
+        for m in part.getElementsByClass('Measure'):
+            part_ids.append(part_idx)
+            numbers.append(m.number)
+            suffixes.append(bool(m.numberSuffix))
+            offsets.append(part_offset + float(m.offset))
+    return {'part' : np.array(part_ids, dtype=int),
+            'number' : np.array(numbers, dtype=int),
+            'suffix' : np.array(suffixes, dtype=bool),
+            'offset' : np.array(offsets, dtype=float)}
+
+
+def get_measure_numbers(measure_index, offsets):
+    """Finds the measure numbers for many offsets at once.
+
+    Arguments:
+        measure_index {dict} -- measure index from build_measure_index
+        offsets {array} -- distances from the beginning of the piece measured in quarter-note lengths
+
+    Returns:
+        numpy array -- the measure number for each offset
+    """
+    idx = np.searchsorted(measure_index['offset'], np.asarray(offsets, dtype=float), side='right') - 1
+    return measure_index['number'][np.clip(idx, 0, None)]
+
+
+def get_measure_ranges(measure_index, beat_offset_list, window_size, start=0, stop=None):
+    """Finds the first and last measure of every window.
+
+    Arguments:
+        measure_index {dict} -- measure index from build_measure_index
+        beat_offset_list {list} -- list of the offsets of all beats
+        window_size {int} -- length of sliding window measured in beats (NOT quarter-lengths)
+
+    Keyword Arguments:
+        start {int} -- index of the first window (default: {0})
+        stop {int} -- index after the last window (default: {None}, which runs to the end of the piece)
+
+    Returns:
+        numpy array -- (number of windows x 2) array of start and end measure numbers
+    """
+    beat_offsets = np.asarray(beat_offset_list, dtype=float)
+    window_begins = beat_offsets[:-window_size][start:stop]
+    window_ends = beat_offsets[window_size:][start:stop]
+    if len(window_ends):
+        # the end of the final window is the end of the piece, so take the measure of its last beat
+        window_ends = np.where(window_ends == beat_offsets[-1], beat_offsets[-2], window_ends)
+    return np.column_stack([
+        get_measure_numbers(measure_index, window_begins),
+        get_measure_numbers(measure_index, window_ends)])
+
+
+def get_measure_beats(part):
+    """Finds the start of every measure in a part and the offsets of the beats of its time signature, which is
+    where sliceByBeat cuts the notes of that measure.
+
+    Arguments:
+        part {stream (music21)} -- music21 stream object containing measures
+
+    Returns:
+        tuple -- list of measure start offsets and list of the beat offsets in each measure
+    """
+    from music21 import meter
+
+    measure_starts, measure_beats = [], []
+    ts = None
+    for m in part.getElementsByClass('Measure'):
+        if m.timeSignature is not None:
+            ts = m.timeSignature
+        elif ts is None:
+            ts = m.getContextByClass('TimeSignature') or meter.TimeSignature()
+        measure_starts.append(float(m.offset))
+        measure_beats.append([float(m.offset + b) for b in ts.getBeatOffsets()])
+    return measure_starts, measure_beats
+
+
+def extract_note_events(score, split_at_beats=False, member_durations=False):
+    """Flattens a score once into a columnar table of note events. Chord members become separate events.
+
+    Arguments:
+        score {stream (music21)} -- music21 stream object
+
+    Keyword Arguments:
+        split_at_beats {bool} -- cut every note at the beats of its measure, as sliceByBeat does, without 
+            copying the score (default: {False})
+        member_durations {bool} -- end every piece of a chord member after the member's own duration, as the 
+            'Duration' weights have always counted it; sliceByBeat leaves the members of a sliced chord their 
+            unsliced durations (default: {False}, which ends the pieces where they are cut)
+
+    Returns:
+        dict -- numpy arrays 'onset', 'end', 'pitch_class', 'pitch_space', 'measure', and 'part', one entry per 
+            note (or per piece of a note if split_at_beats is True); 'pitch_space' is the MIDI pitch, including 
+            microtones, for analyses in other EDOs
+    """
+    from music21 import chord
+
+    onsets, ends, pitch_classes, pitch_spaces, measures, part_ids = [], [], [], [], [], []
+    if score.hasPartLikeStreams():
+        parts = [(float(score.elementOffset(p)), p) for p in score.parts]
+    else:
+        parts = [(0.0, score)]
+
+    for part_idx, (part_offset, part) in enumerate(parts):
+        if split_at_beats:
+            measure_starts, measure_beats = get_measure_beats(part)
+        flat_part = part.semiFlat
+        for elem in flat_part.getElementsByClass(['Note', 'Chord']):
+            offset = float(flat_part.elementOffset(elem))
+            end = offset + float(elem.quarterLength)
+            cuts = [offset, end]
+            if split_at_beats:
+                # a note is only cut at the beats of the measure it begins in, even if it runs past its end
+                measure_idx = bisect.bisect_right(measure_starts, offset) - 1
+                if measure_idx >= 0:
+                    cuts[1:1] = [b for b in measure_beats[measure_idx] if offset < b < end]
+            is_chord = isinstance(elem, chord.Chord)
+            if is_chord:
+                notes_ = elem.notes
+            else:
+                notes_ = [elem]
+            measure_number = elem.measureNumber if elem.measureNumber is not None else -1
+            for a in notes_:
+                for piece_begin, piece_end in zip(cuts[:-1], cuts[1:]):
+                    if member_durations and is_chord:
+                        piece_end = piece_begin + float(a.quarterLength)
+                    onsets.append(part_offset + piece_begin)
+                    ends.append(part_offset + piece_end)
+                    pitch_classes.append(a.pitch.pitchClass)
+                    pitch_spaces.append(a.pitch.ps)
+                    measures.append(measure_number)
+                    part_ids.append(part_idx)
+
+    return {'onset' : np.array(onsets, dtype=float),
+            'end' : np.array(ends, dtype=float),
+            'pitch_class' : np.array(pitch_classes, dtype=int),
+            'pitch_space' : np.array(pitch_spaces, dtype=float),
+            'measure' : np.array(measures, dtype=int),
+            'part' : np.array(part_ids, dtype=int)}
+
+
+def edo_pitch_classes(events, edo=12):
+    """Maps the note events to the pitch classes of an equal division of the octave.
+
+    Arguments:
+        events {dict} -- note-event table from extract_note_events
+
+    Keyword Arguments:
+        edo {int} -- number of pitches that equally divide the octave (default: {12})
+
+    Returns:
+        numpy array -- pitch class from 0 to edo - 1 of every event, rounded to the nearest step
+    """
+    if edo == 12:
+        return events['pitch_class']
+    return np.mod(np.around(events['pitch_space'] * edo / 12), edo).astype(int)
+
+
+def beat_histograms(events, beat_offset_list, strategy, edo=12, n_parts=None):
+    """Counts the pitch classes of the note events that begin in each beat.
+
+    Arguments:
+        events {dict} -- note-event table from extract_note_events
+        beat_offset_list {list} -- list of the offsets of all beats
+        strategy {string} -- option of 'Onset', 'Duration', or 'Flat'
+
+    Keyword Arguments:
+        edo {int} -- number of pitches that equally divide the octave (default: {12})
+        n_parts {int} -- count every part on its own, using the 'part' of the events (default: {None}, which 
+            counts all parts together)
+
+    Returns:
+        numpy array -- (number of beats x edo) array of pitch-class weights per beat, or (n_parts x number of 
+            beats x edo) when n_parts is given
+    """
+    beat_offsets = np.asarray(beat_offset_list, dtype=float)
+    n_beats = max(len(beat_offsets) - 1, 0)
+    beat_idx = np.searchsorted(beat_offsets, events['onset'], side='right') - 1
+    in_score = (beat_idx >= 0) & (beat_idx < n_beats)
+    bins = beat_idx[in_score] * edo + edo_pitch_classes(events, edo)[in_score]
+    if n_parts is not None:
+        bins += events['part'][in_score] * (n_beats * edo)
+    if strategy == 'Duration':
+        weights = (events['end'] - events['onset'])[in_score]
+    else:
+        weights = None
+    counts = np.bincount(bins, weights=weights, minlength=(n_parts or 1) * n_beats * edo)
+    if n_parts is not None:
+        return counts.astype(float).reshape(n_parts, n_beats, edo)
+    return counts.astype(float).reshape(-1, edo)
+
+
+def window_matrix(histograms, window_size, strategy):
+    """Sums the per-beat histograms over every window at once using prefix sums.
+
+    Arguments:
+        histograms {numpy array} -- (number of beats x edo) array from beat_histograms, or (parts x number of 
+            beats x edo) to sum every part on its own
+        window_size {int} -- length of sliding window measured in beats (NOT quarter-lengths)
+        strategy {string} -- option of 'Onset', 'Duration', or 'Flat'
+
+    Returns:
+        numpy array -- (number of windows x edo) array with one multiset per row, or (parts x number of windows 
+            x edo)
+    """
+    n_beats, edo = histograms.shape[-2:]
+    cumulative = np.zeros(histograms.shape[:-2] + (n_beats + 1, edo))
+    np.cumsum(histograms, axis=-2, out=cumulative[..., 1:, :])
+    windows = cumulative[..., window_size:, :] - cumulative[..., :-window_size, :]
+    if strategy == 'Flat':
+        return (windows > 0).astype(float)
+    return windows
+
+
+def sliding_window(events, measure_index, beat_offset_list, window_size, strategy, log=True, edo=12, 
+                   dtype=np.float64, coefficients=None):
+    """Runs the sliding window across the score and generates arrays of pitch classes to be used as DFT inputs.
+
+    Arguments:
+        events {dict} -- note-event table from extract_note_events
+        measure_index {dict} -- measure index from build_measure_index
         beat_offset_list {list} -- list of the offsets of all beats
         window_size {int} -- length of sliding window measured in beats (NOT quarter-lengths)
         strategy {string} -- strategy options are 'Onset', 'Duration', and 'Flat'
@@ -157,68 +625,646 @@ def sliding_window(score, beat_offset_list, window_size, strategy, log=True, edo
     Keyword Arguments:
         log {bool} -- applies a logarithmic weight to the array (default: {True})
         edo {int} -- number of pitches that equally divide the octave (default: {12})
+        dtype {numpy dtype} -- storage for the arrays and results; np.float32 halves the memory (default: {np.float64})
+        coefficients {list} -- Fourier coefficients to compute (default: {None}, which uses 1 to edo // 2)
 
     Returns:
-        list -- list of all multiset arrays
-    """
-    all_arrays = []
-    for idx, window_begin in enumerate(beat_offset_list[:-window_size]):
-        window_end = beat_offset_list[idx + window_size]
-        current_array = np.array([0.0]*12)
-        measure1 = get_measure_number(score=score, offset=window_begin)
-        if window_end == beat_offset_list[-1]:
-            measure2 = get_measure_number(score=score, offset=beat_offset_list[-2])
-        else:
-            measure2 = get_measure_number(score=score, offset=window_end)
-        
-        for elem in score.semiFlat.getElementsByOffset(
-            offsetStart=window_begin, 
-            offsetEnd=window_end, 
-            includeEndBoundary=False).getElementsByClass(['Note', 'Chord']):
-            
-            if isinstance(elem, chord.Chord):
-                for a in elem.notes:
-                    current_array = update_array(
-                        array=current_array, 
-                        note_=a, 
-                        strategy=strategy)
-            elif isinstance(elem, note.Note):
-                current_array = update_array(
-                    array=current_array, 
-                    note_=elem, 
-                    strategy=strategy)
-
-        all_arrays.append(dft_array(
-            array=current_array, 
+        dft_matrix -- all multiset arrays; indexing it gives one dft_array per window
+    """
+    histograms = beat_histograms(
+        events=events, 
+        beat_offset_list=beat_offset_list, 
+        strategy=strategy, 
+        edo=edo)
+    windows = window_matrix(
+        histograms=histograms, 
+        window_size=window_size, 
+        strategy=strategy)
+    measure_ranges = get_measure_ranges(
+        measure_index=measure_index, 
+        beat_offset_list=beat_offset_list, 
+        window_size=window_size)
+
+    return dft_matrix(
+        windows=windows, 
+        measure_ranges=measure_ranges, 
+        log_weight=log, 
+        dtype=dtype, 
+        edo=edo, 
+        coefficients=coefficients)
+
+
+def part_sliding_window(events, measure_index, beat_offset_list, window_size, strategy, n_parts, log=True, edo=12, 
+                        dtype=np.float64, coefficients=None):
+    """Runs the sliding window over every part of the score at once, and over all parts together.
+
+    Arguments:
+        events {dict} -- note-event table from extract_note_events
+        measure_index {dict} -- measure index from build_measure_index
+        beat_offset_list {list} -- list of the offsets of all beats
+        window_size {int} -- length of sliding window measured in beats (NOT quarter-lengths)
+        strategy {string} -- strategy options are 'Onset', 'Duration', and 'Flat'
+        n_parts {int} -- number of parts in the score
+
+    Keyword Arguments:
+        log {bool} -- applies a logarithmic weight to the array (default: {True})
+        edo {int} -- number of pitches that equally divide the octave (default: {12})
+        dtype {numpy dtype} -- storage for the arrays and results; np.float32 halves the memory (default: {np.float64})
+        coefficients {list} -- Fourier coefficients to compute (default: {None}, which uses 1 to edo // 2)
+
+    Returns:
+        part_matrix -- (n_parts x number of windows x edo) multisets, and those of all parts together
+    """
+    part_windows = window_matrix(
+        histograms=beat_histograms(events, beat_offset_list, strategy, edo=edo, n_parts=n_parts), 
+        window_size=window_size, 
+        strategy=strategy)
+    # counted again rather than summed over the parts, so the total matches sliding_window exactly
+    total_windows = window_matrix(
+        histograms=beat_histograms(events, beat_offset_list, strategy, edo=edo), 
+        window_size=window_size, 
+        strategy=strategy)
+    measure_ranges = get_measure_ranges(
+        measure_index=measure_index, 
+        beat_offset_list=beat_offset_list, 
+        window_size=window_size)
+
+    return part_matrix(
+        part_windows=part_windows, 
+        total_windows=total_windows, 
+        measure_ranges=measure_ranges, 
+        log_weight=log, 
+        dtype=dtype, 
+        edo=edo, 
+        coefficients=coefficients)
+
+
+def iter_sliding_window(events, measure_index, beat_offset_list, window_size, strategy, log=True, edo=12, 
+                        chunk_size=1024, dtype=np.float64, coefficients=None):
+    """Runs the sliding window like sliding_window, but yields the windows in chunks so that only one chunk of 
+    results is held in memory at a time.
+
+    Arguments:
+        events {dict} -- note-event table from extract_note_events
+        measure_index {dict} -- measure index from build_measure_index
+        beat_offset_list {list} -- list of the offsets of all beats
+        window_size {int} -- length of sliding window measured in beats (NOT quarter-lengths)
+        strategy {string} -- strategy options are 'Onset', 'Duration', and 'Flat'
+
+    Keyword Arguments:
+        log {bool} -- applies a logarithmic weight to the array (default: {True})
+        edo {int} -- number of pitches that equally divide the octave (default: {12})
+        chunk_size {int} -- number of windows per chunk (default: {1024})
+        dtype {numpy dtype} -- storage for the arrays and results; np.float32 halves the memory (default: {np.float64})
+        coefficients {list} -- Fourier coefficients to compute (default: {None}, which uses 1 to edo // 2)
+
+    Yields:
+        dft_matrix -- the next chunk of at most chunk_size windows
+    """
+    histograms = beat_histograms(
+        events=events, 
+        beat_offset_list=beat_offset_list, 
+        strategy=strategy, 
+        edo=edo)
+    n_windows = len(beat_offset_list[:-window_size])
+
+    for start in range(0, n_windows, chunk_size):
+        stop = min(start + chunk_size, n_windows)
+        windows = window_matrix(
+            histograms=histograms[start:stop + window_size - 1], 
+            window_size=window_size, 
+            strategy=strategy)
+        measure_ranges = get_measure_ranges(
+            measure_index=measure_index, 
+            beat_offset_list=beat_offset_list, 
+            window_size=window_size, 
+            start=start, 
+            stop=stop)
+        yield dft_matrix(
+            windows=windows, 
+            measure_ranges=measure_ranges, 
             log_weight=log, 
-            measure_range=(measure1, measure2)))
-        
-    return all_arrays
+            first_window=start + 1, 
+            dtype=dtype, 
+            edo=edo, 
+            coefficients=coefficients)
 
 
-def score_to_data(config):  
-    """Generates all multisets by sliding a window over the score
+def score_variant(strat, slice_by_beat=False):
+    """Names the kind of note-event table a strategy needs.
+
+    'Onset' and 'Flat' count tied notes once ('tied'). 'Duration' cuts the notes at the beats while reading 
+    them ('split'), or reads them from a copy of the score made by sliceByBeat ('sliced').
+
+    Arguments:
+        strat {string} -- strategy options are 'Onset', 'Duration', and 'Flat'
+
+    Keyword Arguments:
+        slice_by_beat {bool} -- slice the score with music21 for 'Duration' (default: {False})
+
+    Returns:
+        string -- 'tied', 'split', or 'sliced'
+    """
+    if strat != "Duration":
+        return 'tied'
+    if slice_by_beat:
+        return 'sliced'
+    return 'split'
+
+
+def extract_score_data(parsed_score, strat, slice_by_beat=False, monitor=None):
+    """Extracts everything the sliding window needs from a parsed score.
+
+    Arguments:
+        parsed_score {stream (music21)} -- music21 stream object from parse_score
+        strat {string} -- strategy options are 'Onset', 'Duration', and 'Flat'
+
+    Keyword Arguments:
+        slice_by_beat {bool} -- slice a copy of the score with music21 for 'Duration' instead of cutting the 
+            notes while reading them (default: {False})
+        monitor {stage_monitor} -- receives the 'beat_offsets', 'slice_by_beat' or 'strip_ties', and 
+            'note_events' stages, see DFT_Monitor (default: {None})
+
+    Returns:
+        dict -- note-event table ('events'), beat offsets ('beat_offsets'), and measure index ('measure_index'), 
+            plus the measure of every beat ('beat_measures') and every measure of every part ('part_measures') 
+            for cutting out excerpts
+    """
+    monitor = monitor or Monitor.stage_monitor()
+    score_data = {}
+    with monitor.stage('beat_offsets') as counters:
+        score_data['beat_offsets'] = get_beat_offsets_from_score(score=parsed_score.parts[0])
+        score_data['measure_index'] = build_measure_index(score=parsed_score.parts[0])
+        score_data['beat_measures'] = np.array(get_beat_measure_numbers(score=parsed_score.parts[0]), dtype=int)
+        score_data['part_measures'] = get_part_measures(score=parsed_score)
+        counters['beats'] = len(score_data['beat_offsets']) - 1
+        counters['measures'] = len(score_data['measure_index']['offset'])
+
+    variant = score_variant(strat, slice_by_beat)
+    source = parsed_score
+    if variant == 'sliced':
+        with monitor.stage('slice_by_beat'):
+            source = parsed_score.sliceByBeat(addTies=False)
+    elif variant == 'tied':
+        with monitor.stage('strip_ties'):
+            source = parsed_score.stripTies(retainContainers=True)
+
+    with monitor.stage('note_events') as counters:
+        score_data['events'] = extract_note_events(source, split_at_beats=(variant == 'split'), 
+                                                   member_durations=(variant != 'tied'))
+        counters['notes'] = len(score_data['events']['onset'])
+        if monitor.active:
+            counters['chords'] = sum(1 for _ in parsed_score.recurse().getElementsByClass('Chord'))
+    return score_data
+
+
+def load_untied_events(repertoire, use_cache=True, parser=parse_score, monitor=None):
+    """Gets the notes of the whole piece as written, before stripTies, which excerpt_score_data needs to cut a tie 
+    chain at the end of an excerpt of 'tied' score data. They are cached apart from the score data (as the 
+    'untied' variant), so only pieces that are cut into such excerpts read them.
+
+    Arguments:
+        repertoire {string} -- path to file
+
+    Keyword Arguments:
+        use_cache {bool} -- read from and write to the cache in DFT_Cache (default: {True})
+        parser {function} -- called as parser(score_string, excerpt) when the score must be parsed (default: {parse_score})
+        monitor {stage_monitor} -- receives the 'cache_load', 'parse', 'untied_events', and 'cache_store' stages, 
+            see DFT_Monitor (default: {None})
+
+    Returns:
+        dict -- note-event table, see extract_note_events
+    """
+    monitor = monitor or Monitor.stage_monitor()
+    if use_cache:
+        with monitor.stage('cache_load') as counters:
+            key = Cache.cache_key(score_string=repertoire, excerpt=None, variant='untied')
+            cached = Cache.load(key)
+            counters['hit'] = cached is not None
+        if cached is not None:
+            return cached['events']
+
+    with monitor.stage('parse'):
+        parsed_score = parser(score_string=repertoire, excerpt=None)
+    with monitor.stage('untied_events') as counters:
+        events = extract_note_events(parsed_score)
+        counters['notes'] = len(events['onset'])
+    if use_cache:
+        with monitor.stage('cache_store') as counters:
+            counters['bytes_written'] = Cache.store(key, {'events' : events})
+    return events
+
+
+def excerpt_score_data(score_data, excerpt, untied_events=None):
+    """Cuts the score data of an excerpt out of the score data of the whole piece, giving the same score data as 
+    extracting it from parse_score(score_string, excerpt) but without parsing.
+
+    Like the parsed excerpt, every part starts at 0 and the beats and measure index are those of the excerpt's 
+    own measures. As in the parsed excerpt, a note tied into the excerpt starts on its first beat, and a note tied 
+    out of it is replaced by its tied notes inside the excerpt, because stripTies leaves tie chains without an 
+    ending unjoined.
 
     Arguments:
-        config {tuple} -- all user inputs
+        score_data {dict} -- score data of the whole piece from extract_score_data
+        excerpt {tuple} -- beginning and ending measures
+
+    Keyword Arguments:
+        untied_events {function} -- for 'tied' score data, returns the notes of the whole piece before stripTies, 
+            e.g. from load_untied_events; it is only called when a tie chain crosses the excerpt's end 
+            (default: {None}, for the other variants)
 
     Returns:
-        list -- all multisets
+        dict -- see extract_score_data, or None if the excerpt's measures are not found or not contiguous
     """
-    repertoire, excerpt, window, strat, log = config
-    parsed_score = parse_score(score_string=repertoire, excerpt=excerpt)
-    beat_offset_list = get_beat_offsets_from_score(score=parsed_score.parts[0])
+    begin, end = excerpt
+    beat_in_excerpt = (score_data['beat_measures'] >= begin) & (score_data['beat_measures'] <= end)
+    beat_idx = np.flatnonzero(beat_in_excerpt)
+    if len(beat_idx) == 0 or beat_idx[-1] - beat_idx[0] + 1 != len(beat_idx):
+        return None
+    beat_offsets = score_data['beat_offsets'][beat_idx[0]:beat_idx[-1] + 2]
+
+    # each part of the excerpt starts at its own first measure
+    measures = score_data['part_measures']
+    in_excerpt = (measures['number'] >= begin) & (measures['number'] <= end)
+    n_parts = measures['part'].max() + 1 if len(measures['part']) else 0
+    part_starts = np.full(n_parts, np.nan)
+    part_ends = np.full(n_parts, np.inf)
+    for part in range(n_parts):
+        rows = np.flatnonzero(measures['part'] == part)
+        inside = rows[in_excerpt[rows]]
+        if len(inside) == 0:
+            continue
+        part_starts[part] = measures['offset'][inside[0]]
+        after = rows[rows > inside[-1]]
+        if len(after):
+            part_ends[part] = measures['offset'][after[0]]
+    if len(part_starts) == 0 or np.isnan(part_starts[0]):
+        return None
+
+    def cut(events, selected):
+        start = part_starts[events['part'][selected]]
+        cut_events = {field : values[selected] for field, values in events.items()}
+        cut_events['onset'] = cut_events['onset'] - start
+        cut_events['end'] = cut_events['end'] - start
+        return cut_events
 
-    if strat == "Duration":
-        adjusted_score = parsed_score.sliceByBeat(addTies=False)
+    events = score_data['events']
+    in_measures = (events['measure'] >= begin) & (events['measure'] <= end)
+    if untied_events is None:
+        excerpt_events = cut(events, in_measures)
     else:
-        adjusted_score = parsed_score.stripTies(retainContainers=True)
+        # stripTies joins the rest of a tie chain cut off by the excerpt's beginning, but leaves a chain cut off by
+        # its end as separate tied notes
+        start, stop = part_starts[events['part']], part_ends[events['part']]
+        with np.errstate(invalid='ignore'):
+            carried = (events['onset'] < start) & (events['end'] > start) & (events['end'] <= stop)
+            crossing = (events['end'] > stop) & (events['onset'] < stop)
+        whole = cut(events, (in_measures | carried) & ~crossing)
+        whole_carried = carried[(in_measures | carried) & ~crossing]
+        whole['onset'][whole_carried] = 0.0
+        whole['measure'][whole_carried] = begin
+        excerpt_events = whole
+        if crossing.any():
+            untied = untied_events()
+            untied_in_measures = (untied['measure'] >= begin) & (untied['measure'] <= end)
+            from_chain = np.zeros(len(untied['onset']), dtype=bool)
+            for idx in np.flatnonzero(crossing):
+                from_chain |= ((untied['part'] == events['part'][idx]) 
+                               & (untied['pitch_space'] == events['pitch_space'][idx]) 
+                               & (untied['onset'] >= events['onset'][idx]) 
+                               & (untied['onset'] < events['end'][idx]))
+            pieces = cut(untied, untied_in_measures & from_chain)
+            excerpt_events = {field : np.concatenate([whole[field], pieces[field]]) for field in whole}
+
+    part_rows = np.flatnonzero(in_excerpt)
+    return {'events' : excerpt_events,
+            'beat_offsets' : beat_offsets - beat_offsets[0],
+            'measure_index' : make_measure_index(
+                offsets=measures['offset'][part_rows[measures['part'][part_rows] == 0]] - part_starts[0], 
+                numbers=measures['number'][part_rows[measures['part'][part_rows] == 0]], 
+                suffixes=measures['suffix'][part_rows[measures['part'][part_rows] == 0]]),
+            'beat_measures' : score_data['beat_measures'][beat_idx],
+            'part_measures' : {'part' : measures['part'][part_rows], 
+                               'number' : measures['number'][part_rows], 
+                               'suffix' : measures['suffix'][part_rows], 
+                               'offset' : measures['offset'][part_rows] - part_starts[measures['part'][part_rows]]}}
+
+
+def load_score_data(repertoire, excerpt, strat, use_cache=True, parser=parse_score, slice_by_beat=False, 
+                    monitor=None, stream_excerpts=True):
+    """Gets the extracted score data from the on-disk cache, parsing the score only when it is not cached.
+
+    An excerpt of a local MusicXML file is read measure by measure with DFT_MusicXML, without building the whole 
+    score in music21; files that reader does not handle are parsed with the parser. This is done for parse_score, 
+    and for parsers that give what it does and say so with a parses_like attribute of parse_score, such as 
+    DFT_Batch's.
+
+    Arguments:
+        repertoire {string} -- path to file
+        excerpt {tuple} -- beginning and ending measures if it is an excerpt
+        strat {string} -- strategy options are 'Onset', 'Duration', and 'Flat'
+
+    Keyword Arguments:
+        use_cache {bool} -- read from and write to the cache in DFT_Cache (default: {True})
+        parser {function} -- called as parser(score_string, excerpt) when the score must be parsed (default: {parse_score})
+        slice_by_beat {bool} -- slice the score with music21 for 'Duration' (default: {False})
+        monitor {stage_monitor} -- receives the 'cache_load', 'stream_excerpt', 'parse', and 'cache_store' stages 
+            and those of extract_score_data, see DFT_Monitor (default: {None})
+        stream_excerpts {bool} -- read excerpts of local MusicXML files with DFT_MusicXML (default: {True})
+
+    Returns:
+        dict -- see extract_score_data
+    """
+    monitor = monitor or Monitor.stage_monitor()
+    if use_cache:
+        with monitor.stage('cache_load') as counters:
+            key = Cache.cache_key(score_string=repertoire, excerpt=excerpt, variant=score_variant(strat, slice_by_beat))
+            score_data = Cache.load(key)
+            counters['hit'] = score_data is not None
+        if score_data is not None:
+            return score_data
+
+    score_data = None
+    parses_like_parse_score = parser is parse_score or getattr(parser, 'parses_like', None) is parse_score
+    if stream_excerpts and excerpt and parses_like_parse_score and MusicXML.is_musicxml(repertoire):
+        with monitor.stage('stream_excerpt') as counters:
+            try:
+                score_data = MusicXML.read_score_data(repertoire, excerpt, strat, slice_by_beat=slice_by_beat)
+            except MusicXML.musicxml_error:
+                counters['fallback'] = True
+            else:
+                counters['measures'] = len(score_data['measure_index']['offset'])
+                counters['notes'] = len(score_data['events']['onset'])
+    if score_data is None:
+        with monitor.stage('parse'):
+            parsed_score = parser(score_string=repertoire, excerpt=excerpt)
+        score_data = extract_score_data(parsed_score=parsed_score, strat=strat, slice_by_beat=slice_by_beat, 
+                                        monitor=monitor)
+    if use_cache:
+        with monitor.stage('cache_store') as counters:
+            counters['bytes_written'] = Cache.store(key, score_data)
+    return score_data
+
+
+def score_to_data(config, use_cache=True, slice_by_beat=False, parser=parse_score, dtype=np.float64, memoize=True, 
+                  monitor=None):  
+    """Generates all multisets by sliding a window over the score
+
+    Results are kept in DFT_Cache.memory, keyed by piece, excerpt, settings, parser name, and use_cache, so asking 
+    again in the same session returns them at once. An excerpt of a piece whose score data is in memory is cut out of 
+    it with excerpt_score_data, and only the windows that differ from the whole piece's (those crossing the excerpt's 
+    boundaries) are transformed again when its results are in memory too.
+
+    Arguments:
+        config {analysis_config, dict, or tuple} -- all user inputs; see DFT_Config.as_config
+
+    Keyword Arguments:
+        use_cache {bool} -- reuse parsed and extracted scores stored by DFT_Cache (default: {True})
+        slice_by_beat {bool} -- for 'Duration', slice the score with music21's sliceByBeat instead of splitting 
+            the notes arithmetically; both give the same arrays (default: {False})
+        parser {function} -- called as parser(score_string, excerpt) when the score must be parsed (default: {parse_score})
+        dtype {numpy dtype} -- storage for the arrays and results; np.float32 halves the memory (default: {np.float64})
+        memoize {bool} -- keep and reuse score data and results in DFT_Cache.memory; the results are returned 
+            as read-only views of the kept ones, see dft_matrix.read_only (default: {True})
+        monitor {stage_monitor} -- receives the time and counters of every stage ('memory', 'excerpt', those of 
+            load_score_data, 'windowing', and 'dft'), and profiles the stages it was asked to; see DFT_Monitor 
+            (default: {None})
+
+    Returns:
+        dft_matrix -- all multisets
+    """
+    config = Config.as_config(config)
+    monitor = monitor or Monitor.stage_monitor()
+    variant = score_variant(config.strategy, slice_by_beat)
+    if memoize:
+        with monitor.stage('memory') as counters:
+            # another parser, or a run asked not to use the disk cache, does not get the results of this one; the 
+            # parser is named rather than kept, since a closure over a parsed score would keep the whole score alive
+            parser_name = (getattr(parser, '__module__', None), 
+                           getattr(parser, '__qualname__', type(parser).__qualname__))
+            piece_key = (Cache.cache_key(score_string=config.repertoire, excerpt=None, variant=variant), 
+                         parser_name, bool(use_cache))
+            settings = (config.window, config.strategy, config.log, config.edo, config.coefficients, np.dtype(dtype).str)
+            multisets = Cache.memory.get((piece_key, config.excerpt) + settings)
+            counters['hit'] = multisets is not None
+        if multisets is not None:
+            return multisets.read_only()
+
+    def untied_events():
+        events = Cache.memory.get((piece_key, 'untied'))
+        if events is None:
+            events = load_untied_events(repertoire=config.repertoire, use_cache=use_cache, parser=parser, 
+                                        monitor=monitor)
+            Cache.memory.put((piece_key, 'untied'), events)
+        return events
+
+    score_data = None
+    if memoize and config.excerpt and piece_key in Cache.memory:
+        with monitor.stage('excerpt'):
+            score_data = excerpt_score_data(Cache.memory.get(piece_key), config.excerpt, 
+                                            untied_events=untied_events if variant == 'tied' else None)
+    if score_data is None:
+        score_data = load_score_data(
+            repertoire=config.repertoire, 
+            excerpt=config.excerpt, 
+            strat=config.strategy, 
+            use_cache=use_cache, 
+            parser=parser, 
+            slice_by_beat=slice_by_beat, 
+            monitor=monitor)
+        if memoize and not config.excerpt:
+            Cache.memory.put(piece_key, score_data)
     
-    multisets = sliding_window(
-        score=adjusted_score, 
-        beat_offset_list=beat_offset_list, 
-        window_size=window, 
-        strategy=strat, 
-        log=log)
+    with monitor.stage('windowing', notes=len(score_data['events']['onset'])) as counters:
+        multisets = sliding_window(
+            events=score_data['events'], 
+            measure_index=score_data['measure_index'], 
+            beat_offset_list=score_data['beat_offsets'], 
+            window_size=config.window, 
+            strategy=config.strategy, 
+            log=config.log, 
+            edo=config.edo, 
+            dtype=dtype, 
+            coefficients=config.coefficients)
+        counters['windows'] = len(multisets)
+
+    with monitor.stage('dft', windows=len(multisets), coefficients=len(multisets.coefficients)) as counters:
+        piece_results = None
+        if memoize and config.excerpt and piece_key in Cache.memory:
+            piece_results = Cache.memory.get((piece_key, None) + settings)
+        if piece_results is not None:
+            # window i starts on beat i, so the excerpt's windows line up with the piece's from its first beat
+            beat_measures = Cache.memory.get(piece_key)['beat_measures']
+            in_excerpt = (beat_measures >= config.excerpt[0]) & (beat_measures <= config.excerpt[1])
+            if in_excerpt.any():
+                counters['computed'] = len(multisets.reuse_results(piece_results, offset=int(np.argmax(in_excerpt))))
+        if 'computed' not in counters:
+            multisets.compute()
+            counters['computed'] = len(multisets)
+
+    if memoize:
+        Cache.memory.put((piece_key, config.excerpt) + settings, multisets)
+        return multisets.read_only()
+    return multisets
+
+
+def score_to_chunks(config, chunk_size=1024, use_cache=True, slice_by_beat=False, parser=parse_score, 
+                    dtype=np.float64, monitor=None):
+    """Generates the multisets of score_to_data in chunks, for pieces too long to hold all results in memory.
+
+    Arguments:
+        config {analysis_config, dict, or tuple} -- all user inputs; see DFT_Config.as_config
+
+    Keyword Arguments:
+        chunk_size {int} -- number of windows per chunk (default: {1024})
+        use_cache {bool} -- reuse parsed and extracted scores stored by DFT_Cache (default: {True})
+        slice_by_beat {bool} -- for 'Duration', slice the score with music21's sliceByBeat (default: {False})
+        parser {function} -- called as parser(score_string, excerpt) when the score must be parsed (default: {parse_score})
+        dtype {numpy dtype} -- storage for the arrays and results; np.float32 halves the memory (default: {np.float64})
+        monitor {stage_monitor} -- receives the stages of load_score_data, see DFT_Monitor (default: {None})
+
+    Yields:
+        dft_matrix -- the next chunk of multisets
+    """
+    config = Config.as_config(config)
+    score_data = load_score_data(
+        repertoire=config.repertoire, 
+        excerpt=config.excerpt, 
+        strat=config.strategy, 
+        use_cache=use_cache, 
+        parser=parser, 
+        slice_by_beat=slice_by_beat, 
+        monitor=monitor)
+
+    yield from iter_sliding_window(
+        events=score_data['events'], 
+        measure_index=score_data['measure_index'], 
+        beat_offset_list=score_data['beat_offsets'], 
+        window_size=config.window, 
+        strategy=config.strategy, 
+        log=config.log, 
+        edo=config.edo, 
+        chunk_size=chunk_size, 
+        dtype=dtype, 
+        coefficients=config.coefficients)
+
+
+def score_to_parts(config, use_cache=True, slice_by_beat=False, parser=parse_score, dtype=np.float64, monitor=None):
+    """Generates the multisets of every part of the score and of all parts together, from one extraction of the 
+    score.
+
+    Parts are those of music21, so each staff of a piano part is a part of its own.
+
+    Arguments:
+        config {analysis_config, dict, or tuple} -- all user inputs; see DFT_Config.as_config
+
+    Keyword Arguments:
+        use_cache {bool} -- reuse parsed and extracted scores stored by DFT_Cache (default: {True})
+        slice_by_beat {bool} -- for 'Duration', slice the score with music21's sliceByBeat (default: {False})
+        parser {function} -- called as parser(score_string, excerpt) when the score must be parsed (default: {parse_score})
+        dtype {numpy dtype} -- storage for the arrays and results; np.float32 halves the memory (default: {np.float64})
+        monitor {stage_monitor} -- receives the stages of load_score_data, 'windowing', and 'dft', see DFT_Monitor 
+            (default: {None})
+
+    Returns:
+        part_matrix -- the multisets of every part, with those of all parts together as .total
+    """
+    config = Config.as_config(config)
+    monitor = monitor or Monitor.stage_monitor()
+    score_data = load_score_data(
+        repertoire=config.repertoire, 
+        excerpt=config.excerpt, 
+        strat=config.strategy, 
+        use_cache=use_cache, 
+        parser=parser, 
+        slice_by_beat=slice_by_beat, 
+        monitor=monitor)
+    part_numbers = score_data['part_measures']['part']
+    n_parts = int(part_numbers.max()) + 1 if len(part_numbers) else 1
+
+    with monitor.stage('windowing', parts=n_parts) as counters:
+        multisets = part_sliding_window(
+            events=score_data['events'], 
+            measure_index=score_data['measure_index'], 
+            beat_offset_list=score_data['beat_offsets'], 
+            window_size=config.window, 
+            strategy=config.strategy, 
+            n_parts=n_parts, 
+            log=config.log, 
+            edo=config.edo, 
+            dtype=dtype, 
+            coefficients=config.coefficients)
+        counters['windows'] = len(multisets)
+    with monitor.stage('dft', parts=n_parts, windows=len(multisets)):
+        multisets.compute()
+    return multisets
+
+
+def score_to_sweep(repertoire, settings, excerpt=None, use_cache=True, slice_by_beat=False, parser=parse_score, 
+                   edo=12, dtype=np.float64, coefficients=None):
+    """Generates the multisets of score_to_data for many settings of one piece. The score is parsed at most once, 
+    and the extracted score data, per-beat histograms, windows, and measure ranges are shared by every setting 
+    that needs them.
+
+    Arguments:
+        repertoire {string} -- path to file
+        settings {list} -- (window, strategy, log) tuples
+
+    Keyword Arguments:
+        excerpt {tuple} -- beginning and ending measures if it is an excerpt (default: {None})
+        use_cache {bool} -- reuse parsed and extracted scores stored by DFT_Cache (default: {True})
+        slice_by_beat {bool} -- for 'Duration', slice the score with music21's sliceByBeat (default: {False})
+        parser {function} -- called as parser(score_string, excerpt) when the score must be parsed (default: {parse_score})
+        edo {int} -- number of pitches that equally divide the octave (default: {12})
+        dtype {numpy dtype} -- storage for the arrays and results; np.float32 halves the memory (default: {np.float64})
+        coefficients {list} -- Fourier coefficients to compute (default: {None}, which uses 1 to edo // 2)
+
+    Returns:
+        dict -- all multisets (dft_matrix) for each (window, strategy, log) setting
+    """
+    parsed = {}
+    def parse_once(score_string, excerpt):
+        if 'score' not in parsed:
+            parsed['score'] = parser(score_string=score_string, excerpt=excerpt)
+        return parsed['score']
+
+    score_data, histograms, windows, measure_ranges = {}, {}, {}, {}
+    results = {}
+    for setting in settings:
+        config = Config.analysis_config(repertoire, excerpt, *setting, edo=edo, coefficients=coefficients)
+        # 'Onset' and 'Flat' read the same events and histograms; 'Flat' only differs once the windows are summed
+        variant = score_variant(config.strategy, slice_by_beat)
+        if variant not in score_data:
+            score_data[variant] = load_score_data(
+                repertoire=repertoire, 
+                excerpt=excerpt, 
+                strat=config.strategy, 
+                use_cache=use_cache, 
+                parser=parse_once, 
+                slice_by_beat=slice_by_beat)
+            histograms[variant] = beat_histograms(
+                events=score_data[variant]['events'], 
+                beat_offset_list=score_data[variant]['beat_offsets'], 
+                strategy=config.strategy, 
+                edo=edo)
+        data = score_data[variant]
+
+        if (config.window, config.strategy) not in windows:
+            windows[config.window, config.strategy] = window_matrix(
+                histograms=histograms[variant], 
+                window_size=config.window, 
+                strategy=config.strategy)
+        if config.window not in measure_ranges:
+            measure_ranges[config.window] = get_measure_ranges(
+                measure_index=data['measure_index'], 
+                beat_offset_list=data['beat_offsets'], 
+                window_size=config.window)
 
-    return multisets
\ No newline at end of file
+        results[config.window, config.strategy, config.log] = dft_matrix(
+            windows=windows[config.window, config.strategy], 
+            measure_ranges=measure_ranges[config.window], 
+            log_weight=config.log, 
+            dtype=dtype, 
+            edo=edo, 
+            coefficients=config.coefficients)
+    return results
@@ -1,8 +1,14 @@
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import colorsys
+import os
 from math import sin
 
+import numpy as np
+
+import DFT_Monitor as Monitor
+
+
+# above this many windows the panoramas switch to WebGL traces downsampled to this many points
+max_points = 5000
 
 
 rgb_colors = {'f1_colors' : ['rgba(130,202,252,0.4)', 'rgba(61,122,253,0.6)', 'rgba(30,72,143,1)'], 
@@ -13,66 +19,273 @@ rgb_colors = {'f1_colors' : ['rgba(130,202,252,0.4)', 'rgba(61,122,253,0.6)', 'r
               'f6_colors' : ['rgba(211,182,131,0.4)', 'rgba(127,104,78,0.6)', 'rgba(65,2,0,1)']}
 
 
-def make_panorama(df, color_dict=rgb_colors, title=None, savehtml=None):
-    """Makes master panorama interactive plot with all magnitudes, all phases, and all quantized phases.
+def df_coefficients(df):
+    """Reads the Fourier coefficients of a dataframe from its magnitude columns.
+
+    Arguments:
+        df {dataFrame} -- pandas dataframe from make_master_df or make_part_dfs
+
+    Returns:
+        list -- the coefficients, in the order of the columns
+    """
+    if 'Magnitudes' not in df.columns.get_level_values(0):
+        raise ValueError("the dataframe has no 'Magnitudes' columns; make it with DFT_Functions.make_master_df")
+    return [int(name.split()[0][1:]) for name in df['Magnitudes'].columns]
+
+
+def coefficient_colors(color_dict, coefficient):
+    """Gives the three colors (magnitude, phase, quantized phase) of a coefficient.
+
+    Coefficients missing from color_dict, e.g. those above f6 of an edo 24 analysis, get colors of their own, 
+    spread around the color wheel by the golden angle so that neighbouring coefficients differ.
+
+    Arguments:
+        color_dict {dictionary} -- dictionary of rgba colors, e.g. rgb_colors
+        coefficient {int} -- Fourier coefficient
+
+    Returns:
+        list -- rgba colors for the magnitude, the phase, and the quantized phase
+    """
+    if f'f{coefficient}_colors' in color_dict:
+        return color_dict[f'f{coefficient}_colors']
+    hue = (coefficient * 0.381966) % 1.0
+    colors = []
+    for lightness, alpha in ((0.75, 0.4), (0.5, 0.6), (0.25, 1)):
+        r, g, b = (round(255 * c) for c in colorsys.hls_to_rgb(hue, lightness, 0.6))
+        colors.append(f'rgba({r},{g},{b},{alpha})')
+    return colors
+
+
+def trace_coefficients(traces):
+    """Lists the coefficients that traces from panorama_traces were built for, in order."""
+    return list(dict.fromkeys(i for _, i in traces))
+
+
+def lttb_indices(y, n_out):
+    """Picks the points that keep the shape of a line with Largest-Triangle-Three-Buckets downsampling.
+
+    Arguments:
+        y {numpy array} -- values at x = 0, 1, 2, ...
+        n_out {int} -- number of points to keep
+
+    Returns:
+        numpy array -- sorted indices of the kept points, always including the first and the last
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the first and the last point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_hi = edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = (hi + next_hi - 1) / 2
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - np.arange(lo, hi)) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        indices[b + 1] = a
+    return indices
+
+
+def hover_info(df, label, high_volume=False):
+    """Hover text for one trace. In high volume mode the measure range and array are left to the shared hover trace.
+
+    Arguments:
+        df {dataFrame} -- pandas dataframe 
+        label {string} -- name of the plotted value, e.g. 'Phase'
+
+    Keyword Arguments:
+        high_volume {bool} -- leave out the per-window text (default: {False})
+
+    Returns:
+        dict -- hover arguments for the trace
+    """
+    if high_volume:
+        return {}
+    return dict(text=df['General']['Original Array'],
+                customdata=df['General']['Measure Range'],
+                hovertemplate=f"Measure Range: %{{customdata}} <br>{label}: %{{y}}<br>Original Array: %{{text}}")
+
+
+def panorama_traces(df, color_dict=rgb_colors, high_volume=False, coefficients=None):
+    """Builds the phase, quantized phase, and magnitude traces once, so every panorama of a piece can share them.
 
     Arguments:
         df {dataFrame} -- pandas dataframe 
 
     Keyword Arguments:
         color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
-        title {string} -- title of the plot (default: {None})
-        savehtml {string} -- save location for the html file (default: {None})
+        high_volume {bool} -- build WebGL traces without per-window hover text (default: {False})
+        coefficients {list} -- Fourier coefficients to build traces for (default: {None}, which uses all those of 
+            the dataframe)
+
+    Returns:
+        dict -- traces keyed by ('Phase', 'Quantized Phase', or 'Magnitude', coefficient)
     """
-    fig = make_subplots(specs=[[{'secondary_y': True}]])
-    fig.update_layout(autosize=False, width=1000, height=400)
-    
-    for i in range(1, 7):
+    import plotly.graph_objects as go
+
+    available = df_coefficients(df)
+    if coefficients is None:
+        coefficients = available
+    missing = [i for i in coefficients if i not in available]
+    if missing:
+        raise ValueError(f"the dataframe has no columns for {', '.join(f'f{i}' for i in missing)}; "
+                         f"it holds {', '.join(f'f{i}' for i in available)}")
 
-        fig.add_trace(go.Scatter(
+    Scatter = go.Scattergl if high_volume else go.Scatter
+    traces = {}
+    for i in coefficients:
+        colors = coefficient_colors(color_dict, i)
+
+        traces['Phase', i] = Scatter(
             y=df['Phases'][f'f{i} Phase'], 
             mode='lines', 
             name=f'f{i} Phase',
-            line=dict(color=color_dict[f'f{i}_colors'][1]),
-            text=df['General']['Original Array'],
-            customdata=df['General']['Measure Range'],
-            hovertemplate = 
-            "Measure Range: %{customdata} <br>"+
-            "Phase: %{y}<br>"+
-            "Original Array: %{text}",   
+            line=dict(color=colors[1]),
+            **hover_info(df, 'Phase', high_volume),
             visible='legendonly',
-        ), secondary_y=False)
+        )
         
-        fig.add_trace(go.Scatter(
+        traces['Quantized Phase', i] = Scatter(
             y=df['QuantizedPhases'][f'f{i} Quantized Phase'], 
             mode='lines', 
             name=f'f{i} Quantized Phase',
-            line=dict(color=color_dict[f'f{i}_colors'][2]),   
-            text=df['General']['Original Array'],
-            customdata=df['General']['Measure Range'],
-            hovertemplate = 
-            "Measure Range: %{customdata} <br>"+
-            "Quantized Phase: %{y}<br>"+
-            "Original Array: %{text}",
+            line=dict(color=colors[2]),   
+            **hover_info(df, 'Quantized Phase', high_volume),
             visible='legendonly',
-        ), secondary_y=False)
+        )
         
-        fig.add_trace(go.Scatter(    
+        traces['Magnitude', i] = Scatter(    
             y=df['Magnitudes'][f'f{i} Magnitude'], 
             mode='lines', 
             fill='tozeroy', 
-            fillcolor=color_dict[f'f{i}_colors'][0], 
+            fillcolor=colors[0], 
             name=f'f{i} Magnitude', 
-            line=dict(color=color_dict[f'f{i}_colors'][0]), 
+            line=dict(color=colors[0]), 
             y0=0,
             dy=2,            
-            text=df['General']['Original Array'],
-            customdata=df['General']['Measure Range'],
-            hovertemplate = 
-            "Measure Range: %{customdata} <br>"+
-            "Magnitude: %{y}<br>"+
-            "Original Array: %{text}",  
-        ), secondary_y=True)
+            **hover_info(df, 'Magnitude', high_volume),
+        )
+    return traces
+
+
+def downsample_traces(traces, full_y, n_points, x_range=None):
+    """Replaces the data of each trace with the LTTB points of its full data.
+
+    Arguments:
+        traces {list} -- plotly traces
+        full_y {list} -- full-length y values of each trace
+        n_points {int} -- points kept per trace
+
+    Keyword Arguments:
+        x_range {tuple} -- only keep points inside this range of window indices (default: {None})
+
+    Returns:
+        numpy array -- every window index kept by at least one trace
+    """
+    lo, hi = 0, len(full_y[0])
+    if x_range is not None:
+        lo = max(int(np.floor(x_range[0])) - 1, 0)
+        hi = min(int(np.ceil(x_range[1])) + 2, hi)
+    kept = []
+    for trace, y in zip(traces, full_y):
+        x = lo + lttb_indices(y[lo:hi], n_points)
+        trace.x, trace.y = x, y[x]
+        kept.append(x)
+    return np.unique(np.concatenate(kept))
+
+
+def hover_trace(df, x):
+    """Builds the hidden trace that carries the measure range and array of the windows at x for all traces.
+
+    Arguments:
+        df {dataFrame} -- pandas dataframe 
+        x {numpy array} -- window indices
+
+    Returns:
+        Scattergl (plotly) -- the hover trace
+    """
+    import plotly.graph_objects as go
+
+    return go.Scattergl(
+        mode='markers', 
+        marker=dict(opacity=0), 
+        name='', 
+        showlegend=False, 
+        **hover_data(df, x),
+        hovertemplate = 
+        "Measure Range: %{customdata} <br>"+
+        "Original Array: %{text}<extra></extra>")
+
+
+def hover_data(df, x):
+    """Data of the hover trace for the windows at x."""
+    return dict(x=x, 
+                y=np.zeros(len(x)), 
+                text=np.asarray(df['General']['Original Array'], dtype=object)[x],
+                customdata=np.asarray(df['General']['Measure Range'], dtype=object)[x])
+
+
+def downsample_figure(fig, df, n_points=None, widget=False):
+    """Downsamples every trace with LTTB and adds one hidden trace that carries the hover text for all of them.
+
+    As a FigureWidget the visible range is downsampled again after every zoom, so zooming in shows full resolution.
+
+    Arguments:
+        fig {Figure (plotly)} -- panorama with one full-length trace per series
+        df {dataFrame} -- pandas dataframe 
+
+    Keyword Arguments:
+        n_points {int} -- points kept per trace (default: {None}, which uses max_points)
+        widget {bool} -- return a FigureWidget, which needs ipywidgets (default: {False})
+
+    Returns:
+        Figure or FigureWidget (plotly) -- the downsampled figure
+    """
+    import plotly.graph_objects as go
+
+    n_points = max_points if n_points is None else n_points
+    if widget:
+        fig = go.FigureWidget(fig)
+    traces = fig.data
+    full_y = [np.asarray(trace.y, dtype=float) for trace in traces]
+    fig.add_trace(hover_trace(df, downsample_traces(traces, full_y, n_points)))
+    fig.update_layout(hovermode='x unified')
+
+    def resample(layout, x_range):
+        with fig.batch_update():
+            shared = downsample_traces(traces, full_y, n_points, x_range=x_range)
+            fig.data[-1].update(hover_data(df, shared))
+
+    if widget:
+        fig.layout.on_change(resample, 'xaxis.range')
+    return fig
+
+
+def panorama_figure(traces, title=None):
+    """Lays out the master panorama with all magnitudes, all phases, and all quantized phases.
+
+    Arguments:
+        traces {dict} -- traces from panorama_traces
+
+    Keyword Arguments:
+        title {string} -- title of the plot (default: {None})
+
+    Returns:
+        Figure (plotly) -- the panorama
+    """
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(specs=[[{'secondary_y': True}]])
+    fig.update_layout(autosize=False, width=1000, height=400)
+    
+    for i in trace_coefficients(traces):
+        fig.add_trace(traces['Phase', i], secondary_y=False)
+        fig.add_trace(traces['Quantized Phase', i], secondary_y=False)
+        fig.add_trace(traces['Magnitude', i], secondary_y=True)
 
     fig.update_yaxes(secondary_y=False, 
                      nticks=13, 
@@ -97,77 +310,31 @@ def make_panorama(df, color_dict=rgb_colors, title=None, savehtml=None):
                       font=dict(family='Courier New, monospace', size=16),
                       title=title, 
                       plot_bgcolor='rgb(255,255,255)')
+    return fig
 
-    
-    if savehtml == None:
-        fig.show()
-    else:
-        fig.write_html(f'{savehtml}_Panorama.html')
 
-
-def individual_panorama(df, coefficient, color_dict=rgb_colors, title=None, savehtml=None):
-    """Makes panorama interactive plot for an individual component with its magnitude, phase, and quantized phase.
+def individual_figure(traces, coefficient, title=None):
+    """Lays out the panorama of an individual component with its magnitude, phase, and quantized phase.
 
     Arguments:
-        df {dataFrame} -- pandas dataframe 
+        traces {dict} -- traces from panorama_traces
         coefficient {int} -- Fourier coefficient for the component to be plotted
 
     Keyword Arguments:
-        color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
         title {string} -- title of the plot (default: {None})
-        savehtml {string} -- save location for the html file (default: {None})
+
+    Returns:
+        Figure (plotly) -- the panorama
     """
+    from plotly.subplots import make_subplots
+
     i = coefficient
     fig = make_subplots(specs=[[{'secondary_y': True}]])
     fig.update_layout(autosize=False, width=1000, height=400)
 
-    fig.add_trace(go.Scatter(
-        # x=df['General']['Window Number'], 
-        y=df['Phases'][f'f{i} Phase'], 
-        mode='lines', 
-        name=f'f{i} Phase',
-        line=dict(color=color_dict[f'f{i}_colors'][1]),
-        text=df['General']['Original Array'],
-        customdata=df['General']['Measure Range'],
-        hovertemplate = 
-        "Measure Range: %{customdata} <br>"+
-        "Phase: %{y}<br>"+
-        "Original Array: %{text}",   
-        visible='legendonly',
-    ), secondary_y=False)
-    
-    fig.add_trace(go.Scatter(
-        # x=df['General']['Window Number'], 
-        y=df['QuantizedPhases'][f'f{i} Quantized Phase'], 
-        mode='lines', 
-        name=f'f{i} Quantized Phase',
-        line=dict(color=color_dict[f'f{i}_colors'][2]),   
-        text=df['General']['Original Array'],
-        customdata=df['General']['Measure Range'],
-        hovertemplate = 
-        "Measure Range: %{customdata} <br>"+
-        "Quantized Phase: %{y}<br>"+
-        "Original Array: %{text}",
-        visible='legendonly',
-    ), secondary_y=False)
-    
-    fig.add_trace(go.Scatter(    
-        # x=df['General']['Window Number'], 
-        y=df['Magnitudes'][f'f{i} Magnitude'], 
-        mode='lines', 
-        fill='tozeroy', 
-        fillcolor=color_dict[f'f{i}_colors'][0], 
-        name=f'f{i} Magnitude', 
-        line=dict(color=color_dict[f'f{i}_colors'][0]), 
-        y0=0,
-        dy=2,            
-        text=df['General']['Original Array'],
-        customdata=df['General']['Measure Range'],
-        hovertemplate = 
-        "Measure Range: %{customdata} <br>"+
-        "Magnitude: %{y}<br>"+
-        "Original Array: %{text}",  
-    ), secondary_y=True)
+    fig.add_trace(traces['Phase', i], secondary_y=False)
+    fig.add_trace(traces['Quantized Phase', i], secondary_y=False)
+    fig.add_trace(traces['Magnitude', i], secondary_y=True)
 
     fig.update_yaxes(secondary_y=False, 
                     nticks=13, 
@@ -193,47 +360,28 @@ def individual_panorama(df, coefficient, color_dict=rgb_colors, title=None, save
                     font=dict(family='Courier New, monospace', size=16),
                     title=''.join([f'{conv(title)}', f', f{i}']), 
                     plot_bgcolor='rgb(255,255,255)')
-
-        
-    if savehtml == None:
-        fig.show()
-    else:
-        fig.write_html(f'{savehtml}_-_f{i}.html')
+    return fig
 
 
-def magnitudes_panorama(df, color_dict=rgb_colors, title=None,savehtml=None):
-    """Makes panorama interactive plot with all magnitudes.
+def magnitudes_figure(traces, title=None):
+    """Lays out the panorama with all magnitudes.
 
     Arguments:
-        df {dataFrame} -- pandas dataframe 
+        traces {dict} -- traces from panorama_traces
 
     Keyword Arguments:
-        color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
         title {string} -- title of the plot (default: {None})
-        savehtml {string} -- save location for the html file (default: {None})
+
+    Returns:
+        Figure (plotly) -- the panorama
     """
+    from plotly.subplots import make_subplots
+
     fig = make_subplots(specs=[[{'secondary_y': True}]])
     fig.update_layout(autosize=False, width=1000, height=400)
     
-    for i in range(1, 7):
-
-        fig.add_trace(go.Scatter(    
-            # x=df['General']['Window Number'], 
-            y=df['Magnitudes'][f'f{i} Magnitude'], 
-            mode='lines', 
-            fill='tozeroy', 
-            fillcolor=color_dict[f'f{i}_colors'][0], 
-            name=f'f{i} Magnitude', 
-            line=dict(color=color_dict[f'f{i}_colors'][0]), 
-            y0=0,
-            dy=2,            
-            text=df['General']['Original Array'],
-            customdata=df['General']['Measure Range'],
-            hovertemplate = 
-            "Measure Range: %{customdata} <br>"+
-            "Magnitude: %{y}<br>"+
-            "Original Array: %{text}",  
-        ))
+    for i in trace_coefficients(traces):
+        fig.add_trace(traces['Magnitude', i])
     
     fig.update_yaxes(nticks=6, 
                      showgrid=False, 
@@ -249,9 +397,333 @@ def magnitudes_panorama(df, color_dict=rgb_colors, title=None,savehtml=None):
                       font=dict(family='Courier New, monospace', size=16),
                       title=''.join([f'{conv(title)}', f'Magnitudes']), 
                       plot_bgcolor='rgb(255,255,255)')
+    return fig
 
-    
-    if savehtml == None:
-        fig.show()
+
+def parts_figure(part_traces, part_names, coefficients=None, value='Magnitude', title=None):
+    """Lays out one row per part, one above the other, sharing the window axis so that the parts line up.
+
+    Arguments:
+        part_traces {list} -- traces from panorama_traces for every part
+        part_names {list} -- title of every row
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients to plot (default: {None}, which uses all those of the traces)
+        value {string} -- 'Magnitude', 'Phase', or 'Quantized Phase' (default: {'Magnitude'})
+        title {string} -- title of the plot (default: {None})
+
+    Returns:
+        Figure (plotly) -- the panorama
+    """
+    from plotly.subplots import make_subplots
+
+    if coefficients is None:
+        coefficients = trace_coefficients(part_traces[0])
+
+    n_rows = len(part_traces)
+    fig = make_subplots(rows=n_rows, cols=1, shared_xaxes=True, subplot_titles=list(part_names), 
+                        vertical_spacing=min(0.08, 0.5 / n_rows))
+    fig.update_layout(autosize=False, width=1000, height=150 + 250 * n_rows)
+
+    for row, traces in enumerate(part_traces, start=1):
+        for i in coefficients:
+            # one legend entry per coefficient switches it in every row
+            fig.add_trace(traces[value, i].update(legendgroup=f'f{i}', showlegend=row == 1, visible=True), 
+                          row=row, col=1)
+
+    if value == 'Magnitude':
+        fig.update_yaxes(nticks=6, showgrid=False, title=value)
+    else:
+        fig.update_yaxes(nticks=13, 
+                         tick0=-180, 
+                         dtick=30, 
+                         title=value, 
+                         showgrid=True, 
+                         gridcolor='rgb(222,222,222)')
+    fig.update_xaxes(tick0=1, 
+                     dtick=10, 
+                     showgrid=False)
+    fig.update_xaxes(title='Window Number', row=n_rows, col=1)
+
+    conv = lambda i : i or ''
+    fig.update_layout(hoverlabel=dict(font_size=16), 
+                      font=dict(family='Courier New, monospace', size=16),
+                      title=''.join([f'{conv(title)}', f'{value}s by Part']), 
+                      plot_bgcolor='rgb(255,255,255)')
+    return fig
+
+
+def mark_segments(fig, df):
+    """Draws a dashed line before the first window of every segment after the first, labelled with the segment 
+    number and, on hover, its measures. Does nothing when the dataframe has no 'Segment' column.
+
+    Arguments:
+        fig {Figure (plotly)} -- any of the panoramas
+        df {dataFrame} -- pandas dataframe from make_master_df with segments
+
+    Returns:
+        Figure (plotly) -- the same figure
+    """
+    if ('General', 'Segment') not in df.columns:
+        return fig
+    numbers = df['General', 'Segment'].to_numpy()
+    starts = np.flatnonzero(numbers[1:] != numbers[:-1]) + 1
+    for idx in starts.tolist():
+        if numbers[idx] == 0:
+            continue
+        # the traces plot row idx at x = idx
+        x = idx - 0.5
+        fig.add_shape(type='line', xref='x', yref='paper', x0=x, x1=x, y0=0, y1=1, 
+                      line=dict(color='rgb(120,120,120)', width=1, dash='dash'))
+        fig.add_annotation(x=x, y=1, xref='x', yref='paper', yanchor='bottom', showarrow=False, 
+                           text=str(numbers[idx]), hovertext=df['General', 'Segment Range'].iloc[idx])
+    return fig
+
+
+def show_or_save(fig, df, path, high_volume, n_points, widget, monitor):
+    import plotly.graph_objects as go
+
+    mark_segments(fig, df)
+    if high_volume:
+        with monitor.stage('downsample', windows=len(df), points=n_points):
+            fig = downsample_figure(fig, df, n_points=n_points, widget=widget)
+    elif widget:
+        fig = go.FigureWidget(fig)
+    if widget:
+        return fig
+
+    if path == None:
+        with monitor.stage('show'):
+            fig.show()
     else:
-        fig.write_html(f'{savehtml}_-_Magnitudes.html')
+        with monitor.stage('write_html', output=path) as counters:
+            fig.write_html(path)
+            counters['bytes_written'] = os.path.getsize(path)
+
+
+def make_panorama(df, color_dict=rgb_colors, title=None, savehtml=None, high_volume=None, n_points=None, widget=False, 
+                  monitor=None):
+    """Makes master panorama interactive plot with all magnitudes, all phases, and all quantized phases.
+
+    Arguments:
+        df {dataFrame} -- pandas dataframe 
+
+    Keyword Arguments:
+        color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
+        title {string} -- title of the plot (default: {None})
+        savehtml {string} -- save location for the html file (default: {None})
+        high_volume {bool} -- draw WebGL traces downsampled to n_points with shared hover text (default: {None}, 
+            which switches it on above n_points windows)
+        n_points {int} -- points kept per trace in high volume mode (default: {None}, which uses max_points)
+        widget {bool} -- return a FigureWidget instead of showing or saving the plot; in high volume mode it 
+            shows full resolution when zoomed in (default: {False})
+        monitor {stage_monitor} -- receives the 'traces', 'figure', 'downsample', and 'write_html' or 'show' 
+            stages, see DFT_Monitor (default: {None})
+
+    Returns:
+        FigureWidget (plotly) -- only when widget is True
+    """
+    n_points = max_points if n_points is None else n_points
+    if high_volume is None:
+        high_volume = len(df) > n_points
+
+    monitor = monitor or Monitor.stage_monitor()
+    with monitor.stage('traces', windows=len(df)):
+        traces = panorama_traces(df, color_dict, high_volume)
+    with monitor.stage('figure'):
+        fig = panorama_figure(traces, title=title)
+    path = None if savehtml == None else f'{savehtml}_Panorama.html'
+    return show_or_save(fig, df, path, high_volume, n_points, widget, monitor)
+
+
+def individual_panorama(df, coefficient, color_dict=rgb_colors, title=None, savehtml=None, high_volume=None, 
+                        n_points=None, widget=False, monitor=None):
+    """Makes panorama interactive plot for an individual component with its magnitude, phase, and quantized phase.
+
+    Arguments:
+        df {dataFrame} -- pandas dataframe 
+        coefficient {int} -- Fourier coefficient for the component to be plotted
+
+    Keyword Arguments:
+        color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
+        title {string} -- title of the plot (default: {None})
+        savehtml {string} -- save location for the html file (default: {None})
+        high_volume {bool} -- draw WebGL traces downsampled to n_points with shared hover text (default: {None}, 
+            which switches it on above n_points windows)
+        n_points {int} -- points kept per trace in high volume mode (default: {None}, which uses max_points)
+        widget {bool} -- return a FigureWidget instead of showing or saving the plot; in high volume mode it 
+            shows full resolution when zoomed in (default: {False})
+        monitor {stage_monitor} -- receives the 'traces', 'figure', 'downsample', and 'write_html' or 'show' 
+            stages, see DFT_Monitor (default: {None})
+
+    Returns:
+        FigureWidget (plotly) -- only when widget is True
+    """
+    n_points = max_points if n_points is None else n_points
+    if high_volume is None:
+        high_volume = len(df) > n_points
+
+    i = coefficient
+    monitor = monitor or Monitor.stage_monitor()
+    with monitor.stage('traces', windows=len(df)):
+        traces = panorama_traces(df, color_dict, high_volume, coefficients=[i])
+    with monitor.stage('figure'):
+        fig = individual_figure(traces, i, title=title)
+    path = None if savehtml == None else f'{savehtml}_-_f{i}.html'
+    return show_or_save(fig, df, path, high_volume, n_points, widget, monitor)
+
+
+def magnitudes_panorama(df, color_dict=rgb_colors, title=None,savehtml=None, high_volume=None, n_points=None, 
+                        widget=False, monitor=None):
+    """Makes panorama interactive plot with all magnitudes.
+
+    Arguments:
+        df {dataFrame} -- pandas dataframe 
+
+    Keyword Arguments:
+        color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
+        title {string} -- title of the plot (default: {None})
+        savehtml {string} -- save location for the html file (default: {None})
+        high_volume {bool} -- draw WebGL traces downsampled to n_points with shared hover text (default: {None}, 
+            which switches it on above n_points windows)
+        n_points {int} -- points kept per trace in high volume mode (default: {None}, which uses max_points)
+        widget {bool} -- return a FigureWidget instead of showing or saving the plot; in high volume mode it 
+            shows full resolution when zoomed in (default: {False})
+        monitor {stage_monitor} -- receives the 'traces', 'figure', 'downsample', and 'write_html' or 'show' 
+            stages, see DFT_Monitor (default: {None})
+
+    Returns:
+        FigureWidget (plotly) -- only when widget is True
+    """
+    n_points = max_points if n_points is None else n_points
+    if high_volume is None:
+        high_volume = len(df) > n_points
+
+    monitor = monitor or Monitor.stage_monitor()
+    with monitor.stage('traces', windows=len(df)):
+        traces = panorama_traces(df, color_dict, high_volume)
+    with monitor.stage('figure'):
+        fig = magnitudes_figure(traces, title=title)
+    path = None if savehtml == None else f'{savehtml}_-_Magnitudes.html'
+    return show_or_save(fig, df, path, high_volume, n_points, widget, monitor)
+
+
+def parts_panorama(part_dfs, part_names=None, coefficients=None, value='Magnitude', color_dict=rgb_colors, 
+                   title=None, savehtml=None, high_volume=None, n_points=None, widget=False, monitor=None):
+    """Makes an interactive plot of several parts side by side, one row per part, e.g. from make_part_dfs.
+
+    Arguments:
+        part_dfs {dict or list} -- pandas dataframes of the parts, all with the same windows, keyed by the title 
+            of their row
+
+    Keyword Arguments:
+        part_names {list} -- title of every row of a list of dataframes (default: {None}, which numbers the parts)
+        coefficients {list} -- Fourier coefficients to plot (default: {None}, which uses all those of the 
+            dataframes)
+        value {string} -- 'Magnitude', 'Phase', or 'Quantized Phase' (default: {'Magnitude'})
+        color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
+        title {string} -- title of the plot (default: {None})
+        savehtml {string} -- save location for the html file (default: {None})
+        high_volume {bool} -- draw WebGL traces downsampled to n_points; the shared hover text shows the array of 
+            the last dataframe (default: {None}, which switches it on above n_points windows)
+        n_points {int} -- points kept per trace in high volume mode (default: {None}, which uses max_points)
+        widget {bool} -- return a FigureWidget instead of showing or saving the plot (default: {False})
+        monitor {stage_monitor} -- receives the 'traces', 'figure', 'downsample', and 'write_html' or 'show' 
+            stages, see DFT_Monitor (default: {None})
+
+    Returns:
+        FigureWidget (plotly) -- only when widget is True
+    """
+    if isinstance(part_dfs, dict):
+        part_names, part_dfs = list(part_dfs), list(part_dfs.values())
+    elif part_names is None:
+        part_names = [f'Part {i + 1}' for i in range(len(part_dfs))]
+    n_points = max_points if n_points is None else n_points
+    if high_volume is None:
+        high_volume = len(part_dfs[0]) > n_points
+
+    monitor = monitor or Monitor.stage_monitor()
+    with monitor.stage('traces', windows=len(part_dfs[0]), parts=len(part_dfs)):
+        part_traces = [panorama_traces(df, color_dict, high_volume, coefficients=coefficients) for df in part_dfs]
+    with monitor.stage('figure'):
+        fig = parts_figure(part_traces, part_names, coefficients=coefficients, value=value, title=title)
+    path = None if savehtml == None else f'{savehtml}_-_Parts.html'
+    return show_or_save(fig, part_dfs[-1], path, high_volume, n_points, widget, monitor)
+
+
+def write_plotlyjs(directory):
+    """Writes plotly.min.js into a folder for html files saved with include_plotlyjs='directory'.
+
+    The file is left alone while it holds the bundle of the installed plotly, and rewritten after an upgrade.
+
+    Arguments:
+        directory {string} -- folder of the html files
+    """
+    from plotly.offline import get_plotlyjs
+
+    path = os.path.join(directory, 'plotly.min.js')
+    plotlyjs = get_plotlyjs().encode('utf-8')
+    if os.path.exists(path) and os.path.getsize(path) == len(plotlyjs):
+        with open(path, 'rb') as f:
+            if f.read() == plotlyjs:
+                return
+
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(plotlyjs)
+    os.replace(temp_path, path)
+
+
+def export_panoramas(df, savehtml, color_dict=rgb_colors, title=None, high_volume=None, n_points=None, monitor=None):
+    """Saves the master panorama, one individual panorama per coefficient, and the magnitudes panorama of one 
+    piece.
+
+    The traces are built (and in high volume mode downsampled) once and shared by all the plots. The html 
+    files load plotly.js from one plotly.min.js next to them instead of each embedding their own copy.
+
+    Arguments:
+        df {dataFrame} -- pandas dataframe 
+        savehtml {string} -- save location for the html files, as for make_panorama
+
+    Keyword Arguments:
+        color_dict {dictionary} -- dictionary of rgba colors (default: {rgb_colors})
+        title {string} -- title of the plots (default: {None})
+        high_volume {bool} -- draw WebGL traces downsampled to n_points with shared hover text (default: {None}, 
+            which switches it on above n_points windows)
+        n_points {int} -- points kept per trace in high volume mode (default: {None}, which uses max_points)
+        monitor {stage_monitor} -- receives the 'traces', 'downsample', 'figure', and one 'write_html' stage per 
+            file, see DFT_Monitor (default: {None})
+
+    Returns:
+        list -- paths of the html files
+    """
+    n_points = max_points if n_points is None else n_points
+    if high_volume is None:
+        high_volume = len(df) > n_points
+
+    monitor = monitor or Monitor.stage_monitor()
+    with monitor.stage('traces', windows=len(df)):
+        traces = panorama_traces(df, color_dict, high_volume)
+    if high_volume:
+        with monitor.stage('downsample', windows=len(df), points=n_points):
+            full_y = [np.asarray(trace.y, dtype=float) for trace in traces.values()]
+            downsample_traces(list(traces.values()), full_y, n_points)
+
+    with monitor.stage('figure'):
+        figures = {f'{savehtml}_Panorama.html' : panorama_figure(traces, title=title)}
+        for i in trace_coefficients(traces):
+            figures[f'{savehtml}_-_f{i}.html'] = individual_figure(traces, i, title=title)
+        figures[f'{savehtml}_-_Magnitudes.html'] = magnitudes_figure(traces, title=title)
+        for fig in figures.values():
+            mark_segments(fig, df)
+
+    write_plotlyjs(os.path.dirname(os.path.abspath(savehtml)))
+    for path, fig in figures.items():
+        with monitor.stage('write_html', output=path) as counters:
+            if high_volume:
+                # hover text only for the windows kept by this plot's own traces
+                fig.add_trace(hover_trace(df, np.unique(np.concatenate([trace.x for trace in fig.data]))))
+                fig.update_layout(hovermode='x unified')
+            fig.write_html(path, include_plotlyjs='directory')
+            counters['bytes_written'] = os.path.getsize(path)
+    return list(figures)
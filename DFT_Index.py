@@ -0,0 +1,484 @@
+"""Finds windows anywhere in the corpus whose Fourier profile is close to a given window.
+
+Example:
+    python DFT_Index.py --index corpus_index batch_results/*_16beat_Duration_log.csv
+    python DFT_Index.py --index corpus_index --corpus --window 16 --strategy Duration
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+import DFT_Corpus as CP
+import DFT_Functions as Funcs
+
+
+# the tree is rebuilt once the rows added since the last build are more than this part of the index
+rebuild_fraction = 0.1
+
+# rows read at a time when the memory-mapped features are searched without a tree
+search_chunk = 65536
+
+# settings a window depends on; an index only holds windows that agree on all of them
+settings_keys = ('window', 'strategy', 'log', 'edo')
+
+# end of the results file names written by DFT_Batch, e.g. 'mozart-k155-movement1_16beat_Duration_log'
+result_name_pattern = re.compile(r'_(\d+)beat_(Duration|Onset|Flat)_(log|linear)$')
+
+
+def kd_tree(features):
+    """Builds a scipy cKDTree over the features, or returns None when scipy is not installed."""
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        return None
+    return cKDTree(features)
+
+
+class window_index(object):
+    """Stores the windows of many pieces as feature vectors in memory-mapped files, and answers nearest-neighbour
+    and range queries with a KD-tree (scipy), or a search through the mapped files without scipy.
+
+    The feature vector of a window holds the magnitudes of the coefficients, then the cosines and then the sines
+    of their phases times phase_weight, so phases on either side of ±180° are close. Every window also keeps its
+    piece, window number, and measure range. Pieces can be added at any time; the files are only appended to.
+    Windows of different settings do not compare, so the index keeps the window size, strategy, log weight, and 
+    edo of its first piece and refuses pieces analyzed with other settings.
+
+    Arguments:
+        directory {string} -- folder of the index; it is created if it does not exist
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients in the feature vectors of a new index (default: {range(1, 7)})
+        phase_weight {float} -- weight of the phases against the magnitudes in a new index; 0 compares the
+            magnitudes only (default: {1.0})
+    """
+    def __init__(self, directory, coefficients=range(1, 7), phase_weight=1.0):
+        self.directory = directory
+        self.meta_path = os.path.join(directory, 'index.json')
+        self.features_path = os.path.join(directory, 'features.f32')
+        self.windows_path = os.path.join(directory, 'windows.i32')
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+            if 'settings' not in self.meta:
+                raise ValueError(f'{self.meta_path} does not keep the settings of its windows; build the index again')
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.meta = {'coefficients' : list(coefficients), 'phase_weight' : phase_weight, 'settings' : None, 
+                         'pieces' : [], 'n_rows' : 0}
+            self.save_meta()
+        self.coefficients = tuple(self.meta['coefficients'])
+        self.phase_weight = self.meta['phase_weight']
+        self.dim = 3 * len(self.coefficients)
+        self._tree = None
+        self._tree_rows = 0
+
+    def __len__(self):
+        return self.meta['n_rows']
+
+    def __contains__(self, piece):
+        return any(entry['piece'] == piece for entry in self.meta['pieces'])
+
+    def pieces(self):
+        return [entry['piece'] for entry in self.meta['pieces']]
+
+    def save_meta(self):
+        temp_path = f'{self.meta_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        os.replace(temp_path, self.meta_path)
+
+    def check_settings(self, settings, source):
+        """Raises ValueError when the settings of new windows differ from those of the windows in the index.
+
+        Arguments:
+            settings {dict} -- 'window', 'strategy', 'log', and 'edo' of the new windows
+            source {string} -- what the windows come from, for the message
+        """
+        unknown = [key for key in settings_keys if settings.get(key) is None]
+        if unknown:
+            names = ' and '.join([', '.join(unknown[:-1]), unknown[-1]]) if len(unknown) > 1 else unknown[0]
+            raise ValueError(f'pass the {names} of {source} to add it to the index')
+        if self.meta['settings'] is None:
+            return
+        different = [f"{key} {settings[key]!r} (the index has {self.meta['settings'][key]!r})" 
+                     for key in settings_keys if settings[key] != self.meta['settings'][key]]
+        if different:
+            raise ValueError(f"{source} does not match the index: {', '.join(different)}")
+
+    def features(self):
+        """Maps the feature vectors of the whole index read-only.
+
+        Returns:
+            numpy array -- (windows x 3 * number of coefficients) float32 array
+        """
+        if len(self) == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.features_path, dtype=np.float32, mode='r', shape=(len(self), self.dim))
+
+    def windows(self):
+        """Maps the piece, window number, start measure, and end measure of every window read-only.
+
+        Returns:
+            numpy array -- (windows x 4) int32 array; the piece is its position in pieces()
+        """
+        if len(self) == 0:
+            return np.zeros((0, 4), dtype=np.int32)
+        return np.memmap(self.windows_path, dtype=np.int32, mode='r', shape=(len(self), 4))
+
+    def feature_vectors(self, magnitudes, phases):
+        """Turns magnitudes and phases into feature vectors, e.g. to query for a profile that is not in the index.
+
+        Arguments:
+            magnitudes {numpy array} -- (windows x coefficients) magnitudes, in the order of self.coefficients
+            phases {numpy array} -- (windows x coefficients) phases in degrees
+
+        Returns:
+            numpy array -- (windows x 3 * number of coefficients) float32 array
+        """
+        magnitudes = np.atleast_2d(np.asarray(magnitudes, dtype=float))
+        radians = np.radians(np.atleast_2d(np.asarray(phases, dtype=float)))
+        return np.hstack([magnitudes, self.phase_weight * np.cos(radians),
+                          self.phase_weight * np.sin(radians)]).astype(np.float32)
+
+    def add(self, piece, chunks, window=None, strategy=None):
+        """Appends the windows of one piece.
+
+        Arguments:
+            piece {string} -- name of the piece in query results, e.g. its DFT_Corpus entry
+            chunks {dft_matrix or iterable} -- results from score_to_data, or chunks from score_to_chunks
+
+        Keyword Arguments:
+            window {int} -- window size in beats the results were made with; required (default: {None})
+            strategy {string} -- strategy the results were made with; required (default: {None})
+
+        Returns:
+            int -- number of windows added
+        """
+        if piece in self:
+            raise ValueError(f'{piece!r} is already in the index')
+        if hasattr(chunks, 'windows'):
+            chunks = [chunks]
+        n_rows = len(self)
+        n_added = 0
+        settings = None
+        try:
+            for chunk in chunks:
+                if settings is None:
+                    # the log weight and edo are kept by the results themselves
+                    settings = {'window' : window, 'strategy' : strategy, 'log' : chunk.log_weight is True, 
+                                'edo' : chunk.edo}
+                    self.check_settings(settings, repr(piece))
+                missing = set(self.coefficients) - set(chunk.coefficients)
+                if missing:
+                    raise ValueError(f'the results do not have coefficients {sorted(missing)}')
+                columns = [chunk.coefficients.index(i) for i in self.coefficients]
+                n_added += self.append(
+                    features=self.feature_vectors(chunk.magnitudes[:, columns], chunk.phases[:, columns]),
+                    window_numbers=chunk.window_numbers(),
+                    measure_ranges=chunk.measure_ranges)
+        except BaseException:
+            # the rows written so far are overwritten by the next piece
+            self.meta['n_rows'] = n_rows
+            raise
+        self.finish_piece(piece, n_added, settings)
+        return n_added
+
+    def add_results_file(self, path, piece=None, window=None, strategy=None, log=None, edo=12):
+        """Appends the windows of one csv or Parquet file written by DFT_Batch or DFT_Export.
+
+        The window size, strategy, and log weight are read from the names DFT_Batch gives its files (see 
+        settings_from_name) unless they are passed.
+
+        Arguments:
+            path {string} -- location of the results file
+
+        Keyword Arguments:
+            piece {string} -- name of the piece in query results (default: {None}, which uses the file name)
+            window {int} -- window size in beats of the results (default: {None}, which reads it from the name)
+            strategy {string} -- strategy of the results (default: {None}, which reads it from the name)
+            log {bool} -- whether the arrays were log weighted (default: {None}, which reads it from the name)
+            edo {int} -- pitch classes per octave of the results; DFT_Batch always uses 12 (default: {12})
+
+        Returns:
+            int -- number of windows added
+        """
+        piece = os.path.splitext(os.path.basename(path))[0] if piece is None else piece
+        if piece in self:
+            raise ValueError(f'{piece!r} is already in the index')
+        settings = settings_from_name(path) or {}
+        for key, value in [('window', window), ('strategy', strategy), ('log', log), ('edo', edo)]:
+            if value is not None:
+                settings[key] = value
+        self.check_settings(settings, path)
+        columns = read_results_file(path)
+        magnitudes = np.column_stack([columns[f'f{i} Magnitude'] for i in self.coefficients])
+        phases = np.column_stack([columns[f'f{i} Phase'] for i in self.coefficients])
+        n_added = self.append(
+            features=self.feature_vectors(magnitudes, phases),
+            window_numbers=columns['Window Number'],
+            measure_ranges=np.column_stack([columns['Start Measure'], columns['End Measure']]))
+        self.finish_piece(piece, n_added, settings)
+        return n_added
+
+    def append(self, features, window_numbers, measure_ranges):
+        piece_id = len(self.meta['pieces'])
+        windows = np.column_stack([np.full(len(features), piece_id), window_numbers, measure_ranges]).astype(np.int32)
+        # the files may be longer than n_rows after an interrupted update, so write from the end of the rows
+        for path, rows, row_bytes in [(self.features_path, features, 4 * self.dim),
+                                      (self.windows_path, windows, 16)]:
+            with open(path, 'ab') as f:
+                f.truncate(self.meta['n_rows'] * row_bytes)
+                f.seek(self.meta['n_rows'] * row_bytes)
+                f.write(np.ascontiguousarray(rows).tobytes())
+        self.meta['n_rows'] += len(features)
+        return len(features)
+
+    def finish_piece(self, piece, n_added, settings):
+        if self.meta['settings'] is None and settings is not None:
+            self.meta['settings'] = {key : settings[key] for key in settings_keys}
+        self.meta['pieces'].append({'piece' : piece, 'n_windows' : n_added})
+        self.save_meta()
+
+    def tree(self):
+        """Builds the KD-tree when there is none yet or too many rows were added since it was built.
+
+        Returns:
+            tuple -- the tree (None without scipy) and the number of rows it covers; later rows are searched
+                without the tree
+        """
+        # False once scipy turned out to be missing, so it is not looked for again
+        if self._tree is not False and len(self) - self._tree_rows > rebuild_fraction * len(self):
+            tree = kd_tree(np.array(self.features()))
+            self._tree = False if tree is None else tree
+            self._tree_rows = 0 if tree is None else len(self)
+        return (None if self._tree is False else self._tree), self._tree_rows
+
+    def scan(self, start=0):
+        """Reads the feature vectors from row start on in chunks of search_chunk rows.
+
+        Yields:
+            tuple -- first row of the chunk and the chunk as a float64 array
+        """
+        features = self.features()
+        for chunk_start in range(start, len(self), search_chunk):
+            yield chunk_start, np.asarray(features[chunk_start:chunk_start + search_chunk], dtype=float)
+
+    def nearest(self, query, k=10):
+        """Finds the k windows whose feature vectors are closest to the query.
+
+        Arguments:
+            query {numpy array} -- feature vector, e.g. from feature_vectors or window_vector
+
+        Keyword Arguments:
+            k {int} -- number of windows returned (default: {10})
+
+        Returns:
+            list -- dicts with 'piece', 'window', 'start_measure', 'end_measure', and 'distance', closest first
+        """
+        query = np.asarray(query, dtype=float).reshape(self.dim)
+        tree, covered = self.tree()
+        rows, distances = [], []
+        if tree is not None and covered:
+            tree_distances, tree_rows = tree.query(query, k=min(k, covered))
+            rows.append(np.atleast_1d(tree_rows))
+            distances.append(np.atleast_1d(tree_distances))
+        for chunk_start, chunk in self.scan(start=covered):
+            chunk_distances = np.sqrt(((chunk - query)**2).sum(axis=1))
+            best = np.argpartition(chunk_distances, min(k, len(chunk)) - 1)[:k]
+            rows.append(chunk_start + best)
+            distances.append(chunk_distances[best])
+        if not rows:
+            return []
+        rows, distances = np.concatenate(rows), np.concatenate(distances)
+        order = np.argsort(distances, kind='stable')[:k]
+        return self.describe(rows[order], distances[order])
+
+    def within(self, query, radius):
+        """Finds every window whose feature vector is within a distance of the query.
+
+        Arguments:
+            query {numpy array} -- feature vector, e.g. from feature_vectors or window_vector
+            radius {float} -- largest distance
+
+        Returns:
+            list -- dicts as from nearest, closest first
+        """
+        query = np.asarray(query, dtype=float).reshape(self.dim)
+        tree, covered = self.tree()
+        rows = []
+        if tree is not None and covered:
+            rows.append(np.array(tree.query_ball_point(query, radius), dtype=int))
+        for chunk_start, chunk in self.scan(start=covered):
+            rows.append(chunk_start + np.flatnonzero(((chunk - query)**2).sum(axis=1) <= radius**2))
+        rows = np.sort(np.concatenate(rows)) if rows else np.zeros(0, dtype=int)
+        distances = np.sqrt(((np.asarray(self.features()[rows], dtype=float) - query)**2).sum(axis=1))
+        order = np.argsort(distances, kind='stable')
+        return self.describe(rows[order], distances[order])
+
+    def search(self, coefficient, min_magnitude=0.0, phase=None, tolerance=15.0):
+        """Finds the windows in which one coefficient is strong and, optionally, near a phase.
+
+        Arguments:
+            coefficient {int} -- Fourier coefficient, e.g. 3
+
+        Keyword Arguments:
+            min_magnitude {float} -- smallest magnitude of the coefficient (default: {0.0})
+            phase {float} -- phase in degrees, compared across ±180° (default: {None}, which allows any phase)
+            tolerance {float} -- largest difference from phase in degrees (default: {15.0})
+
+        Returns:
+            list -- dicts as from nearest, strongest first, with 'magnitude' and 'phase' instead of 'distance'
+        """
+        j = self.coefficients.index(coefficient)
+        if phase is not None and not self.phase_weight:
+            raise ValueError('this index was built without phases (phase_weight=0)')
+        n = len(self.coefficients)
+        rows, magnitudes, phases = [], [], []
+        for chunk_start, chunk in self.scan():
+            chunk_phases = np.degrees(np.arctan2(chunk[:, 2 * n + j], chunk[:, n + j]))
+            keep = chunk[:, j] >= min_magnitude
+            if phase is not None:
+                keep &= np.abs((chunk_phases - phase + 180) % 360 - 180) <= tolerance
+            rows.append(chunk_start + np.flatnonzero(keep))
+            magnitudes.append(chunk[keep, j])
+            phases.append(chunk_phases[keep])
+        if not rows:
+            return []
+        rows, magnitudes, phases = np.concatenate(rows), np.concatenate(magnitudes), np.concatenate(phases)
+        order = np.argsort(-magnitudes, kind='stable')
+        results = self.describe(rows[order])
+        for result, magnitude, row_phase in zip(results, magnitudes[order].tolist(), phases[order].tolist()):
+            result['magnitude'] = magnitude
+            result['phase'] = row_phase
+        return results
+
+    def window_vector(self, piece, window_number):
+        """Returns the feature vector of one window in the index, to find the windows most like it.
+
+        Arguments:
+            piece {string} -- name of the piece in the index
+            window_number {int} -- window number, as in the master DataFrame
+
+        Returns:
+            numpy array -- feature vector
+        """
+        piece_id = self.pieces().index(piece)
+        windows = self.windows()
+        rows = np.flatnonzero((windows[:, 0] == piece_id) & (windows[:, 1] == window_number))
+        if len(rows) == 0:
+            raise KeyError(f'{piece!r} has no window {window_number}')
+        return np.array(self.features()[rows[0]], dtype=float)
+
+    def describe(self, rows, distances=None):
+        pieces = self.pieces()
+        windows = np.asarray(self.windows()[np.asarray(rows, dtype=int)])
+        results = []
+        for idx, (piece_id, window_number, start, end) in enumerate(windows.tolist()):
+            result = {'piece' : pieces[piece_id], 'window' : window_number, 'start_measure' : start,
+                      'end_measure' : end}
+            if distances is not None:
+                result['distance'] = float(distances[idx])
+            results.append(result)
+        return results
+
+
+def settings_from_name(path):
+    """Reads the window size, strategy, and log weight from the name of a results file of DFT_Batch.
+
+    Arguments:
+        path {string} -- location of a file named by DFT_Batch.result_name
+
+    Returns:
+        dict -- 'window', 'strategy', and 'log', or None if the name is not one of DFT_Batch's
+    """
+    match = result_name_pattern.search(os.path.splitext(os.path.basename(path))[0])
+    if match is None:
+        return None
+    return {'window' : int(match.group(1)), 'strategy' : match.group(2), 'log' : match.group(3) == 'log'}
+
+
+def read_results_file(path):
+    """Reads the columns of a results file written by DFT_Export.
+
+    Arguments:
+        path {string} -- location of a csv or Parquet file
+
+    Returns:
+        dict -- column name to numpy array, for every column but 'Original Array'
+    """
+    if path.lower().endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('reading Parquet files requires pyarrow (pip install pyarrow)')
+        table = pq.read_table(path)
+        return {name : table.column(name).to_numpy() for name in table.column_names if name != 'Original Array'}
+
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    columns = {}
+    for idx, name in enumerate(header):
+        if name != 'Original Array':
+            dtype = int if name in ('Window Number', 'Start Measure', 'End Measure') else float
+            columns[name] = np.array([row[idx] for row in rows], dtype=dtype)
+    return columns
+
+
+def index_corpus(directory, pieces=None, window=16, strategy='Duration', log=True, use_cache=True):
+    """Adds every piece that is not in the index yet, analyzing it with score_to_chunks.
+
+    Arguments:
+        directory {string} -- folder of the index
+
+    Keyword Arguments:
+        pieces {list} -- entries from DFT_Corpus (default: {None}, which uses DFT_Corpus.full_corpus)
+        window {int} -- window size in beats (default: {16})
+        strategy {string} -- option of 'Onset', 'Duration', or 'Flat' (default: {'Duration'})
+        log {bool} -- applies a logarithmic weight to the arrays (default: {True})
+        use_cache {bool} -- reuse scores stored by DFT_Cache (default: {True})
+
+    Returns:
+        window_index -- the updated index
+    """
+    index = window_index(directory)
+    # before analyzing anything, as every piece would be refused
+    index.check_settings({'window' : window, 'strategy' : strategy, 'log' : bool(log), 'edo' : 12}, 
+                         'the corpus analysis')
+    for piece in CP.full_corpus if pieces is None else pieces:
+        if piece not in index:
+            index.add(piece, Funcs.score_to_chunks((piece, None, window, strategy, log), use_cache=use_cache), 
+                      window=window, strategy=strategy)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('results', nargs='*', help='csv or Parquet files from DFT_Batch to add')
+    parser.add_argument('--index', required=True, help='folder of the index')
+    parser.add_argument('--corpus', action='store_true', help='analyze and add the pieces of DFT_Corpus')
+    parser.add_argument('--window', type=int, default=16)
+    parser.add_argument('--strategy', default='Duration', choices=['Duration', 'Onset', 'Flat'])
+    parser.add_argument('--linear', action='store_true', help='no log weight (with --corpus)')
+    args = parser.parse_args(argv)
+
+    index = window_index(args.index)
+    for path in args.results:
+        piece = os.path.splitext(os.path.basename(path))[0]
+        if piece not in index:
+            index.add_results_file(path, piece=piece)
+    if args.corpus:
+        index = index_corpus(args.index, window=args.window, strategy=args.strategy, log=not args.linear)
+    print(f'{len(index)} windows of {len(index.pieces())} pieces in {args.index}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""Reports the time and counters of each stage of a run, and profiles chosen stages with cProfile or tracemalloc."""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+import warnings
+from contextlib import contextmanager
+
+
+logger = logging.getLogger('DFT_Panorama')
+
+profilers = ('cprofile', 'tracemalloc')
+
+# the stage running under cProfile; only one profiler can run at a time (a second one takes over from the first 
+# on Python 3.11 and raises ValueError from 3.12)
+profiled_stage = None
+
+# the highest traced memory of each open stage profiled with tracemalloc before a stage inside it reset the peak
+traced_peaks = []
+
+
+class stage_monitor(object):
+    """Times the stages of a run and reports each finished stage as a dict.
+
+    Every record has 'stage' and 'seconds', plus the counters of the stage (e.g. 'windows', 'notes', 'chords',
+    'measures', 'bytes_written') and 'output' or 'report' when there is one. Records are passed to the callback,
+    logged at INFO level, and kept in records.
+
+    Keyword Arguments:
+        callback {function} -- called with the record of every finished stage (default: {None})
+        logger {Logger} -- logging.Logger for the records, e.g. DFT_Monitor.logger (default: {None})
+        profile {dict} -- stage name to 'cprofile' or 'tracemalloc'; those stages run under the profiler and
+            its report is written next to the stage's output, or in report_dir (default: {None})
+        report_dir {string} -- folder for reports of stages without an output file (default: {None}, which uses
+            the working directory)
+        name {string} -- start of the report file names of stages without an output file (default: {'DFT'})
+    """
+    def __init__(self, callback=None, logger=None, profile=None, report_dir=None, name='DFT'):
+        self.callback = callback
+        self.logger = logger
+        self.profile = dict(profile or {})
+        for stage, kind in self.profile.items():
+            if kind not in profilers:
+                raise ValueError(f'profile for {stage!r} must be one of {profilers}, got {kind!r}')
+        self.report_dir = report_dir
+        self.name = name
+        self.records = []
+
+    @property
+    def active(self):
+        """Whether anything reads the records, so counters that cost time to find are worth finding."""
+        return bool(self.callback or self.logger or self.profile)
+
+    @contextmanager
+    def stage(self, name, output=None, **counters):
+        """Times the code in a with block as one stage.
+
+        Counters known in advance are passed as keywords; the yielded dict takes those found inside the block.
+        A stage to be profiled with cProfile inside another one that is, e.g. 'parse' inside DFT_Batch's 
+        'write_results', is not profiled on its own: its calls are in the outer stage's report, which its record 
+        names as 'profiled_in', and a RuntimeWarning says so. A stage profiled with tracemalloc resets the traced 
+        peak when it starts, so its report gives the peak of the stage even when tracing was already on.
+
+        Arguments:
+            name {string} -- stage name, e.g. 'parse' or 'windowing'
+
+        Keyword Arguments:
+            output {string} -- file written by the stage, which profiler reports are saved next to (default: {None})
+        """
+        global profiled_stage
+        record = {'stage' : name}
+        record.update(counters)
+        kind = self.profile.get(name)
+        if kind == 'cprofile' and profiled_stage is not None:
+            warnings.warn(f'stage {name!r} is not profiled on its own because it runs inside {profiled_stage!r}, '
+                          f'which is already profiled with cProfile; see the report of {profiled_stage!r}', 
+                          RuntimeWarning, stacklevel=3)
+            record['profiled_in'] = profiled_stage
+            kind = None
+        profiler = cProfile.Profile() if kind == 'cprofile' else None
+        started_tracing = kind == 'tracemalloc' and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif kind == 'tracemalloc':
+            reset_peak()
+        if kind == 'tracemalloc':
+            traced_peaks.append(0)
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # another profiler outside this monitor, e.g. python -m cProfile, is running
+                warnings.warn(f'stage {name!r} is not profiled because another profiler is running', 
+                              RuntimeWarning, stacklevel=3)
+                profiler = None
+            else:
+                profiled_stage = name
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                profiled_stage = None
+                record['report'] = self.write_report(name, output, profile_report(profiler))
+            elif kind == 'tracemalloc':
+                peak = max(traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if traced_peaks:
+                    traced_peaks[-1] = max(traced_peaks[-1], peak)
+                report = tracemalloc_report(tracemalloc.take_snapshot(), peak=peak)
+                if started_tracing:
+                    tracemalloc.stop()
+                record['report'] = self.write_report(name, output, report)
+            if output is not None:
+                record['output'] = output
+            self.emit(record)
+
+    def emit(self, record):
+        """Keeps a record and passes it to the callback and logger."""
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+        if self.logger is not None:
+            counters = ''.join(f' {k}={v}' for k, v in record.items() if k not in ('stage', 'seconds'))
+            self.logger.info('%s %.4fs%s', record['stage'], record['seconds'], counters,
+                             extra={'dft_stage' : record})
+
+    def report_path(self, stage, output, kind):
+        """Picks a report file name that no earlier report of this monitor used."""
+        if output is not None:
+            base = f'{os.path.splitext(output)[0]}.{stage}'
+        else:
+            base = os.path.join(self.report_dir or os.getcwd(), f'{self.name}_{stage}')
+        used = {record.get('report') for record in self.records}
+        path, n = f'{base}.{kind}.txt', 1
+        while path in used:
+            n += 1
+            path = f'{base}-{n}.{kind}.txt'
+        return path
+
+    def write_report(self, stage, output, report):
+        path = self.report_path(stage, output, self.profile[stage])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(report)
+        return path
+
+    def totals(self):
+        """Adds up the time of every stage.
+
+        Returns:
+            dict -- stage name to total seconds, in the order the stages first finished
+        """
+        totals = {}
+        for record in self.records:
+            totals[record['stage']] = totals.get(record['stage'], 0.0) + record['seconds']
+        return totals
+
+
+def profile_report(profiler, n_lines=40):
+    """Lists the functions that took the most cumulative time.
+
+    Arguments:
+        profiler {Profile (cProfile)} -- finished profiler
+
+    Keyword Arguments:
+        n_lines {int} -- number of functions listed (default: {40})
+
+    Returns:
+        string -- pstats report
+    """
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(n_lines)
+    return stream.getvalue()
+
+
+def reset_peak():
+    """Resets the traced peak for a stage starting while tracing is on, keeping the peak so far for the stage 
+    it runs inside. Python 3.8 cannot reset it, so there the peak stays that of the whole trace."""
+    if not hasattr(tracemalloc, 'reset_peak'):
+        return
+    if traced_peaks:
+        traced_peaks[-1] = max(traced_peaks[-1], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+
+
+def tracemalloc_report(snapshot, n_lines=40, peak=None):
+    """Lists the lines that hold the most memory allocated while tracing.
+
+    Arguments:
+        snapshot {Snapshot (tracemalloc)} -- snapshot taken at the end of the stage
+
+    Keyword Arguments:
+        n_lines {int} -- number of lines listed (default: {40})
+        peak {int} -- highest traced memory of the stage in bytes (default: {None}, which uses the traced peak)
+
+    Returns:
+        string -- one line per source line, largest first, after the peak and current totals
+    """
+    current, traced_peak = tracemalloc.get_traced_memory()
+    peak = traced_peak if peak is None else peak
+    # stages reset the peak when they start; Python 3.8 cannot, so there it is the peak since tracing started
+    since = 'the stage started' if hasattr(tracemalloc, 'reset_peak') else 'tracing started'
+    lines = [f'current {current / 1024**2:.2f} MB, peak {peak / 1024**2:.2f} MB since {since}']
+    lines.extend(str(stat) for stat in snapshot.statistics('lineno')[:n_lines])
+    return '\n'.join(lines) + '\n'
+
+
+def parse_profile(values):
+    """Reads 'stage=kind' strings from the command line, e.g. ['parse=cprofile', 'windowing=tracemalloc'].
+
+    Arguments:
+        values {list} -- strings of a stage name and a profiler joined by '='
+
+    Returns:
+        dict -- stage name to profiler, for stage_monitor
+    """
+    profile = {}
+    for value in values or []:
+        stage, _, kind = value.partition('=')
+        profile[stage] = kind or 'cprofile'
+    return profile
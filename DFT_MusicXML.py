@@ -0,0 +1,408 @@
+"""Reads the score data of an excerpt straight from a MusicXML file, without building a music21 stream.
+
+The file is read one <measure> at a time with iterparse. Before the excerpt only the running divisions, time
+signature, and offset of each part are kept, and note events are made only for the measures of the excerpt. Note
+lengths, full measure rests, staves, and ties follow music21's MusicXML reader and stripTies, so the result is the
+score data that extract_score_data gives for parse_score(path, excerpt). Key signatures are not needed, since
+MusicXML spells every pitch out.
+"""
+import itertools
+import os
+import re
+import zipfile
+from fractions import Fraction
+from functools import lru_cache
+from xml.etree import ElementTree
+
+import numpy as np
+
+
+musicxml_extensions = ('.xml', '.musicxml', '.mxl')
+
+step_semitones = {'C' : 0, 'D' : 2, 'E' : 4, 'F' : 5, 'G' : 7, 'A' : 9, 'B' : 11}
+
+# quarter lengths of the <type> values
+type_lengths = {name : Fraction(2) ** (5 - k) for k, name in enumerate(
+    ['maxima', 'long', 'breve', 'whole', 'half', 'quarter', 'eighth', '16th', '32nd', '64th', '128th', '256th',
+     '512th', '1024th'])}
+
+
+class musicxml_error(ValueError):
+    """Raised for files the streaming reader does not handle, so the caller can parse them with music21 instead."""
+
+
+def is_musicxml(path):
+    return os.path.splitext(path)[1].lower() in musicxml_extensions and os.path.isfile(path)
+
+
+def open_musicxml(path):
+    """Opens the score document of a MusicXML file, including the one inside a compressed .mxl file.
+
+    Arguments:
+        path {string} -- path to a .xml, .musicxml, or .mxl file
+
+    Returns:
+        file -- binary file object of the score document
+    """
+    if not path.lower().endswith('.mxl'):
+        return open(path, 'rb')
+    archive = zipfile.ZipFile(path)
+    names = archive.namelist()
+    score_name = None
+    if 'META-INF/container.xml' in names:
+        container = ElementTree.fromstring(archive.read('META-INF/container.xml'))
+        rootfile = container.find('.//rootfile')
+        if rootfile is not None:
+            score_name = rootfile.get('full-path')
+    if score_name is None:
+        score_name = next(name for name in names if not name.startswith('META-INF') and name.endswith('.xml'))
+    return archive.open(score_name)
+
+
+@lru_cache(maxsize=None)
+def beat_offsets_in_measure(ratio_string):
+    """Lists where sliceByBeat cuts the notes of a measure, as get_measure_beats does."""
+    from music21 import meter
+
+    return tuple(float(b) for b in meter.TimeSignature(ratio_string).getBeatOffsets())
+
+
+@lru_cache(maxsize=None)
+def measure_number(text):
+    """Splits a measure number attribute, e.g. '12a', into the number and suffix that music21 gives it."""
+    match = re.match(r'\D*(\d+)(.*)$', text or '')
+    if match is None:
+        return 0, ''
+    return int(match.group(1)), match.group(2)
+
+
+def note_pitch(note_element):
+    """Finds the MIDI pitch of a <note>, including microtones, or None for rests and unpitched notes."""
+    pitch = note_element.find('pitch')
+    if pitch is None:
+        return None
+    alter = float(pitch.findtext('alter') or 0)
+    return (int(pitch.findtext('octave')) + 1) * 12 + step_semitones[pitch.findtext('step').strip()] + alter
+
+
+@lru_cache(maxsize=None)
+def raw_length(count, divisions):
+    """Finds music21's quarter length for a <duration> of a <note> without <type>. A length that cannot be
+    written with note values leaves the note at music21's default of one quarter.
+    """
+    from music21 import duration
+
+    raw = duration.Duration()
+    raw.quarterLength = count / divisions
+    try:
+        raw.components
+    except duration.DurationException:
+        return Fraction(1)
+    return Fraction(raw.quarterLength)
+
+
+def note_length(note_element, divisions):
+    """Finds the quarter length of a <note> the way music21 does: from its <type>, dots, and time modification
+    when it has a type, and from <duration> otherwise. Grace notes have no length.
+    """
+    if note_element.find('grace') is not None:
+        return Fraction(0)
+    note_type = (note_element.findtext('type') or '').strip()
+    if note_type not in type_lengths:
+        return raw_length(float(note_element.findtext('duration') or 0), divisions)
+    length = type_lengths[note_type] * (2 - Fraction(1, 2 ** len(note_element.findall('dot'))))
+    time_modification = note_element.find('time-modification')
+    if time_modification is not None:
+        length *= Fraction(int(time_modification.findtext('normal-notes') or 1),
+                           int(time_modification.findtext('actual-notes') or 1))
+    return length
+
+
+def note_tie(note_element):
+    """Finds the tie type of a <note> from its <tie> elements, as music21 does: 'start', 'stop', 'continue' for
+    a note with both, or None.
+    """
+    types = [tie.get('type') for tie in note_element.findall('tie') if tie.get('type') is not None]
+    if not types and note_element.find('tie') is None:
+        return None
+    if len(types) == 1:
+        return types[0]
+    if 'start' in types and 'stop' in types:
+        return 'continue'
+    return 'start'
+
+
+class part_reader(object):
+    """Keeps the running state of one part while its measures are read.
+
+    A part with several <staves> becomes one PartStaff per staff in music21, so the notes, chords, and rests of
+    the excerpt are kept per staff as [onset, length, measure number, [(pitch space, tie type) of every note]];
+    a rest has no notes.
+    """
+    def __init__(self, excerpt):
+        self.begin, self.end = excerpt
+        self.divisions = 1
+        self.staves = 1
+        self.ratio_string = None
+        self.offset = Fraction(0)
+        self.start = None
+        # measures of the excerpt: (number, suffix, offset from the part's start, ratio string at its beginning)
+        self.measures = []
+        self.elements = {}
+
+    def read_measure(self, measure):
+        number, suffix = measure_number(measure.get('number'))
+        in_excerpt = self.begin <= number <= self.end
+        if in_excerpt and self.start is None:
+            self.start = self.offset
+        ratio_string = self.ratio_string
+        position = longest = Fraction(0)
+        element = None
+        n_notes, rests = 0, []
+        for child in measure:
+            if child.tag == 'attributes':
+                divisions = child.findtext('divisions')
+                if divisions:
+                    self.divisions = int(divisions)
+                staves = child.findtext('staves')
+                if staves:
+                    self.staves = max(self.staves, int(staves))
+                time = child.find('time')
+                if time is not None and time.find('senza-misura') is None:
+                    if len(time.findall('beats')) != 1:
+                        raise musicxml_error('composite time signatures are not read')
+                    self.ratio_string = f"{time.findtext('beats').strip()}/{time.findtext('beat-type').strip()}"
+                    if position == 0:
+                        ratio_string = self.ratio_string
+            elif child.tag == 'note':
+                if child.find('chord') is not None and element is not None:
+                    # chord members start with the first note and keep the chord's duration
+                    pitch = note_pitch(child)
+                    if pitch is not None:
+                        element[3].append((pitch, note_tie(child)))
+                    continue
+                length = note_length(child, self.divisions)
+                element = [self.offset - (self.start or 0) + position, length, number, []]
+                if in_excerpt:
+                    self.elements.setdefault(int(child.findtext('staff') or 1), []).append(element)
+                rest = child.find('rest')
+                if rest is None:
+                    n_notes += 1
+                    pitch = note_pitch(child)
+                    if pitch is not None:
+                        element[3].append((pitch, note_tie(child)))
+                    position += length
+                else:
+                    rests.append((position, length, rest.get('measure') == 'yes',
+                                  child.findtext('type') in ('whole', 'breve') and child.find('dot') is None
+                                  and child.find('time-modification') is None))
+                    position += length
+                    # the end of a lone rest is settled after the measure
+                    continue
+            elif child.tag == 'backup':
+                position -= Fraction(int(child.findtext('duration')), self.divisions)
+            elif child.tag == 'forward':
+                position += Fraction(int(child.findtext('duration')), self.divisions)
+            longest = max(longest, position)
+
+        # music21 stretches or shrinks a lone whole rest, or a first rest marked measure="yes", to the bar
+        full_measure = any(rest[2] for rest in rests) or (len(rests) == 1 and n_notes == 0)
+        for rest_idx, (rest_onset, rest_length, measure_yes, whole) in enumerate(rests):
+            if full_measure and rest_idx == 0 and (measure_yes or whole):
+                beats, beat_type = (self.ratio_string or '4/4').split('/')
+                rest_length = Fraction(4 * int(beats), int(beat_type))
+            longest = max(longest, rest_onset + rest_length)
+        if in_excerpt:
+            self.measures.append((number, suffix, self.offset - self.start, ratio_string or '4/4'))
+        self.offset += longest
+
+    def staff_elements(self):
+        """Lists the elements of every staff in the order of music21's flat PartStaffs: by onset, with grace
+        notes first, and otherwise in the order they were read.
+
+        Returns:
+            list -- one list of [onset, length, measure number, notes] per staff
+        """
+        n_staves = max([self.staves] + list(self.elements))
+        return [sorted(self.elements.get(staff, []), key=lambda element: (element[0], element[1] != 0))
+                for staff in range(1, n_staves + 1)]
+
+
+def tied_notes(elements):
+    """Joins tie chains as stripTies does. A 'start' continues a chain only when the element just before it is in
+    the chain, a 'stop' ends whatever chain is open, and the first element of a chain takes the length of all of
+    them. So a chain cut off by the excerpt's beginning or end keeps its notes separate, unless it has a 'continue'.
+
+    Arguments:
+        elements {list} -- [onset, length, measure number, notes] of one staff, from part_reader.staff_elements
+
+    Returns:
+        list -- (onset, end, pitch space, measure number) of every note
+    """
+    lengths = [element[1] for element in elements]
+    deleted = set()
+    connected = []
+    for idx, (_, _, _, notes) in enumerate(elements):
+        ties = [tie for _, tie in notes]
+        tie = next((t for t in ties if t is not None), None)
+        if tie == 'start':
+            if idx - 1 not in connected:
+                connected = []
+            connected.append(idx)
+            continue
+        if tie == 'continue':
+            connected.append(idx)
+            continue
+        if len(notes) == 1:
+            ends = tie == 'stop'
+        else:
+            ends = bool(notes) and None not in ties and set(ties) == {'stop'}
+        if not ends:
+            continue
+        connected.append(idx)
+        if len(connected) >= 2:
+            lengths[connected[0]] += sum(lengths[i] for i in connected[1:])
+            deleted.update(connected[1:])
+        connected = []
+    return [(onset, onset + lengths[idx], pitch, number) for idx, (onset, _, number, notes) in enumerate(elements)
+            if idx not in deleted for pitch, _ in notes]
+
+
+def note_table(notes, part_idx, cuts=None):
+    """Lays out (onset, end, pitch space, measure number) tuples as an extract_note_events table."""
+    rows = []
+    for onset, end, pitch, number in notes:
+        onset, end = float(onset), float(end)
+        pieces = [onset, end]
+        if cuts is not None:
+            pieces[1:1] = [b for b in cuts(onset) if onset < b < end]
+        for piece_begin, piece_end in zip(pieces[:-1], pieces[1:]):
+            rows.append((piece_begin, piece_end, pitch, number, part_idx))
+    return rows
+
+
+def split_note_table(elements, part_idx, cuts):
+    """Cuts the notes of a staff's elements at the beats, as note_table does, except that every piece of a chord
+    member ends after the length of the whole chord, as in the score music21's sliceByBeat returns.
+
+    Arguments:
+        elements {list} -- [onset, length, measure number, notes] of one staff, from part_reader.staff_elements
+        part_idx {int} -- part number of the rows
+        cuts {function} -- gives the beats of the measure a note begins in, from its onset
+
+    Returns:
+        list -- (onset, end, pitch space, measure number, part) rows for events_from_rows
+    """
+    rows = []
+    for onset, length, number, notes in elements:
+        if len(notes) < 2:
+            rows.extend(note_table([(onset, onset + length, pitch, number) for pitch, _ in notes], part_idx, cuts))
+            continue
+        onset, end = float(onset), float(onset + length)
+        pieces = [onset] + [b for b in cuts(onset) if onset < b < end]
+        rows.extend((piece_begin, piece_begin + float(length), pitch, number, part_idx)
+                    for pitch, _ in notes for piece_begin in pieces)
+    return rows
+
+
+def events_from_rows(rows):
+    columns = list(zip(*rows)) if rows else [[]] * 5
+    pitch_space = np.array(columns[2], dtype=float)
+    return {'onset' : np.array(columns[0], dtype=float),
+            'end' : np.array(columns[1], dtype=float),
+            'pitch_class' : np.round(pitch_space).astype(int) % 12,
+            'pitch_space' : pitch_space,
+            'measure' : np.array(columns[3], dtype=int),
+            'part' : np.array(columns[4], dtype=int)}
+
+
+def read_parts(path, excerpt):
+    """Reads every part of a partwise MusicXML file, keeping only the notes of the excerpt's measures.
+
+    Arguments:
+        path {string} -- path to a .xml, .musicxml, or .mxl file
+        excerpt {tuple} -- beginning and ending measures
+
+    Returns:
+        list -- one part_reader per part
+    """
+    parts = []
+    with open_musicxml(path) as f:
+        part_element = None
+        for event, element in ElementTree.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == 'score-timewise':
+                    raise musicxml_error('timewise MusicXML files are not read')
+                if element.tag == 'part' and part_element is None:
+                    part_element = element
+                    parts.append(part_reader(excerpt))
+            elif element.tag == 'measure' and part_element is not None:
+                parts[-1].read_measure(element)
+                # the measure is no longer needed, so the tree never grows past one measure
+                part_element.remove(element)
+            elif element.tag == 'part' and element is part_element:
+                part_element = None
+                element.clear()
+    return parts
+
+
+def read_score_data(path, excerpt, strat, slice_by_beat=False):
+    """Reads the score data of an excerpt from a MusicXML file without parsing the whole score with music21.
+
+    Arguments:
+        path {string} -- path to a .xml, .musicxml, or .mxl file
+        excerpt {tuple} -- beginning and ending measures
+        strat {string} -- strategy options are 'Onset', 'Duration', and 'Flat'
+
+    Keyword Arguments:
+        slice_by_beat {bool} -- accepted for the signature of extract_score_data; notes are always cut at the
+            beats arithmetically, which gives the same arrays (default: {False})
+
+    Returns:
+        dict -- see DFT_Functions.extract_score_data
+    """
+    import DFT_Functions as Funcs
+
+    # one entry per staff, which music21 makes a part of its own
+    staves = [(part, elements) for part in read_parts(path, excerpt) if part.measures
+              for elements in part.staff_elements()]
+    if not staves:
+        raise musicxml_error(f'no measures {excerpt[0]}-{excerpt[1]} in {path}')
+    parts = [part for part, _ in staves]
+
+    variant = Funcs.score_variant(strat, slice_by_beat)
+    rows = []
+    for part_idx, (part, elements) in enumerate(staves):
+        if variant == 'tied':
+            rows.extend(note_table(tied_notes(elements), part_idx))
+        else:
+            measure_starts = [float(m[2]) for m in part.measures]
+            measure_beats = [[float(m[2]) + b for b in beat_offsets_in_measure(m[3])] for m in part.measures]
+            def cuts(onset, measure_starts=measure_starts, measure_beats=measure_beats):
+                measure_idx = np.searchsorted(measure_starts, onset, side='right') - 1
+                return measure_beats[measure_idx] if measure_idx >= 0 else []
+            rows.extend(split_note_table(elements, part_idx, cuts))
+
+    first = parts[0].measures
+    lengths = []
+    beat_measures = []
+    for number, _, _, ratio_string in first:
+        beats = Funcs.beat_lengths(ratio_string)
+        lengths.extend(beats)
+        beat_measures.extend([number] * len(beats))
+    beat_offsets = np.array(list(itertools.accumulate(lengths, initial=0)), dtype=float)
+
+    score_data = {
+        'events' : events_from_rows(rows),
+        'beat_offsets' : beat_offsets,
+        'measure_index' : Funcs.make_measure_index(
+            offsets=[float(m[2]) for m in first],
+            numbers=[m[0] for m in first],
+            suffixes=[bool(m[1]) for m in first]),
+        'beat_measures' : np.array(beat_measures, dtype=int),
+        'part_measures' : {
+            'part' : np.array([idx for idx, part in enumerate(parts) for _ in part.measures], dtype=int),
+            'number' : np.array([m[0] for part in parts for m in part.measures], dtype=int),
+            'suffix' : np.array([bool(m[1]) for part in parts for m in part.measures], dtype=bool),
+            'offset' : np.array([float(m[2]) for part in parts for m in part.measures], dtype=float)}}
+    return score_data
@@ -0,0 +1,260 @@
+"""Splits the DFT trajectory of a piece into segments at its change points, reading the windows in order.
+
+Example:
+    python DFT_Segment.py --pieces sample_corpus/MozartK157_expo.xml --window 16 --coefficients 3 5
+"""
+import argparse
+import sys
+
+import numpy as np
+
+
+def window_points(chunk, coefficients=None):
+    """Places every coefficient of every window in the complex plane, at its magnitude and phase.
+
+    Magnitudes are divided by the weighted total of the window (the 0th coefficient), so windows that hold more
+    notes do not move further, and silent windows sit at 0.
+
+    Arguments:
+        chunk {dft_matrix} -- windows from sliding_window or iter_sliding_window
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients to use (default: {None}, which uses all those of the chunk)
+
+    Returns:
+        numpy array -- (windows x coefficients) complex array
+    """
+    columns = [chunk.coefficients.index(i) for i in (coefficients or chunk.coefficients)]
+    weighted = np.log2(chunk.windows + 1) if chunk.log_weight is True else chunk.windows
+    totals = weighted.sum(axis=1, dtype=float)
+    totals[totals == 0] = np.inf
+    radians = np.radians(chunk.phases[:, columns].astype(float))
+    return chunk.magnitudes[:, columns] / totals[:, None] * np.exp(1j * radians)
+
+
+class change_detector(object):
+    """Finds change points in the DFT trajectory of a piece as its windows arrive, reading every window once.
+
+    Every window is a point with one complex coordinate per coefficient (see window_points). Because the phase is
+    the angle of a point rather than a number, phases on either side of ±180° are close, and the phase of a weak
+    coefficient, which means little, moves the point little. The segment keeps the running mean and spread 
+    (variance) of its windows, and each new window is scored by its squared distance from the mean over the 
+    distance expected from the spread. A CUSUM test adds up how far the scores go beyond radius²: the sum rises 
+    while the windows move away from the segment and drops back to 0 while they stay within it. Once it passes 
+    threshold, the segment ends before the window where the sum began to rise, and the windows since then start 
+    the next segment. Only those windows are kept; the segment itself is a running mean and spread.
+
+    Overlapping windows move little from one to the next, so the spread of a few windows says little. The spread 
+    of a segment therefore starts from that of the piece so far, weighted as warm_up windows, and its own windows 
+    take over as it grows; no window is tested before warm_up windows of the piece have been read.
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients to follow (default: {(3, 5)}; None uses all those of the windows)
+        threshold {float} -- rise of the sum that marks a change (default: {10.0})
+        radius {float} -- distance from the mean of the segment, in units of its spread, that is still taken as 
+            part of it; lower finds more segments (default: {1.5})
+        min_length {int} -- fewest windows in a segment; the first min_length windows of a segment are never 
+            tested (default: {8})
+        warm_up {int} -- windows read before the first test, and the weight of the spread of the piece in the 
+            spread of a segment (default: {32})
+    """
+    def __init__(self, coefficients=(3, 5), threshold=10.0, radius=1.5, min_length=8, warm_up=32):
+        self.coefficients = coefficients
+        self.threshold = threshold
+        self.radius = radius
+        self.min_length = max(int(min_length), 1)
+        self.warm_up = max(int(warm_up), 1)
+        self.segments = []
+        # mean and sum of squared deviations of every window read so far
+        self.piece_n = 0
+        self.piece_mean = None
+        self.piece_m2 = 0.0
+        self.new_segment()
+
+    def new_segment(self):
+        self.n = 0
+        self.mean = None
+        self.m2 = 0.0
+        self.first = None
+        self.last = None
+        self.total = 0.0
+        # windows since the sum began to rise, which start the next segment if a change is found
+        self.pending = []
+
+    def take(self, point, window_number, measure_range):
+        """Adds a window to the current segment, updating its mean and spread with Welford's method."""
+        if self.n == 0:
+            self.mean = point.copy()
+            self.m2 = 0.0
+            self.first = (window_number, measure_range)
+        else:
+            previous = self.mean
+            self.mean = previous + (point - previous) / (self.n + 1)
+            self.m2 += float(np.real(np.vdot(point - previous, point - self.mean)))
+        self.n += 1
+        self.last = (window_number, measure_range)
+
+    def read(self, point):
+        """Adds a window to the spread of the piece."""
+        self.piece_n += 1
+        if self.piece_n == 1:
+            self.piece_mean = point.copy()
+            return
+        previous = self.piece_mean
+        self.piece_mean = previous + (point - previous) / self.piece_n
+        self.piece_m2 += float(np.real(np.vdot(point - previous, point - self.piece_mean)))
+
+    def variance(self):
+        """Spread of the current segment, starting from that of the piece."""
+        piece_variance = self.piece_m2 / (self.piece_n - 1) if self.piece_n > 1 else 0.0
+        return (self.m2 + self.warm_up * piece_variance) / (self.n - 1 + self.warm_up)
+
+    def update(self, chunk):
+        """Reads the next windows of the piece.
+
+        Arguments:
+            chunk {dft_matrix} -- the next windows, e.g. one chunk from iter_sliding_window
+
+        Returns:
+            list -- the segments that ended in this chunk, as from find_segments
+        """
+        found = len(self.segments)
+        for window in zip(window_points(chunk, self.coefficients), chunk.window_numbers().tolist(),
+                          chunk.measure_ranges.tolist()):
+            self.add(*window)
+        return self.segments[found:]
+
+    def follow(self, chunks):
+        """Reads every chunk on its way to other code, e.g. DFT_Export.write_window_chunks, so no chunk is kept.
+
+        Arguments:
+            chunks {iterable} -- dft_matrix chunks, e.g. from score_to_chunks
+
+        Yields:
+            dft_matrix -- each chunk, after update has read it
+        """
+        for chunk in chunks:
+            self.update(chunk)
+            yield chunk
+
+    def add(self, point, window_number, measure_range):
+        """Reads one window. It is scored at most once, and taken into a segment once."""
+        self.read(point)
+        if self.n < self.min_length or self.piece_n <= self.warm_up:
+            self.take(point, window_number, measure_range)
+            return
+        expected = self.variance() * (1 + 1 / self.n)
+        distance = float(np.real(np.vdot(point - self.mean, point - self.mean)))
+        if expected > 0:
+            score = distance / expected
+        else:
+            # every window so far was the same, so any other is a change
+            score = np.inf if distance > 0 else 0.0
+        self.total = max(self.total + score - self.radius**2, 0.0)
+        if self.total == 0:
+            for window in self.pending:
+                self.take(*window)
+            self.pending = []
+            self.take(point, window_number, measure_range)
+            return
+
+        self.pending.append((point, window_number, measure_range))
+        if self.total > self.threshold:
+            pending = self.pending
+            self.close_segment()
+            self.new_segment()
+            for window in pending:
+                self.take(*window)
+
+    def close_segment(self):
+        (first, first_range), (last, last_range) = self.first, self.last
+        # a later segment begins where its first window ends, with the first music that differs
+        start_measure = first_range[0] if not self.segments else first_range[1]
+        self.segments.append((len(self.segments) + 1, first, last, start_measure, last_range[1]))
+
+    def finish(self):
+        """Ends the last segment once every window has been read.
+
+        Returns:
+            list -- every segment, as from find_segments
+        """
+        for window in self.pending:
+            self.take(*window)
+        if self.n:
+            self.close_segment()
+        self.new_segment()
+        return self.segments
+
+
+def find_segments(chunks, coefficients=(3, 5), threshold=10.0, radius=1.5, min_length=8, warm_up=32):
+    """Segments the windows of a piece with a change_detector.
+
+    Arguments:
+        chunks {dft_matrix or iterable} -- results from score_to_data, or chunks from score_to_chunks
+
+    Keyword Arguments:
+        coefficients {list} -- Fourier coefficients to follow (default: {(3, 5)}; None uses all those of the windows)
+        threshold {float} -- rise of the sum that marks a change (default: {10.0})
+        radius {float} -- distance from the mean of the segment, in units of its spread, that is still taken as 
+            part of it (default: {1.5})
+        min_length {int} -- fewest windows in a segment (default: {8})
+        warm_up {int} -- windows read before the first test (default: {32})
+
+    Returns:
+        list -- (segment number, first window, last window, start measure, end measure) for every segment
+    """
+    if hasattr(chunks, 'windows'):
+        chunks = [chunks]
+    detector = change_detector(coefficients=coefficients, threshold=threshold, radius=radius, min_length=min_length,
+                               warm_up=warm_up)
+    for chunk in chunks:
+        detector.update(chunk)
+    return detector.finish()
+
+
+def segment_numbers(segments, window_numbers):
+    """Gives the number of the segment that holds each window.
+
+    Arguments:
+        segments {list} -- segments from find_segments
+        window_numbers {numpy array} -- window numbers, e.g. from dft_matrix.window_numbers
+
+    Returns:
+        numpy array -- segment number of every window, 0 for windows outside all segments
+    """
+    window_numbers = np.asarray(window_numbers)
+    if not segments:
+        return np.zeros(len(window_numbers), dtype=int)
+    firsts = np.array([segment[1] for segment in segments])
+    lasts = np.array([segment[2] for segment in segments])
+    idx = np.searchsorted(firsts, window_numbers, side='right') - 1
+    inside = (idx >= 0) & (window_numbers <= lasts[np.maximum(idx, 0)])
+    return np.where(inside, np.array([segment[0] for segment in segments])[np.maximum(idx, 0)], 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pieces', nargs='+', required=True, help='pieces from DFT_Corpus or local score files')
+    parser.add_argument('--window', type=int, default=16, help='window size in beats')
+    parser.add_argument('--strategy', default='Duration', choices=['Duration', 'Onset', 'Flat'])
+    parser.add_argument('--coefficients', nargs='+', type=int, default=[3, 5], help='coefficients to follow')
+    parser.add_argument('--threshold', type=float, default=10.0, help='rise that marks a change (default: 10.0)')
+    parser.add_argument('--radius', type=float, default=1.5, 
+                        help='distance within a segment, in units of its spread (default: 1.5)')
+    parser.add_argument('--min-length', type=int, default=8, help='fewest windows in a segment (default: 8)')
+    parser.add_argument('--warm-up', type=int, default=32, help='windows read before the first test (default: 32)')
+    args = parser.parse_args(argv)
+
+    import DFT_Functions as Funcs
+    for piece in args.pieces:
+        chunks = Funcs.score_to_chunks((piece, None, args.window, args.strategy, True))
+        print(piece)
+        segments = find_segments(chunks, coefficients=args.coefficients, threshold=args.threshold, radius=args.radius,
+                                 min_length=args.min_length, warm_up=args.warm_up)
+        for number, first, last, start, end in segments:
+            print(f'  {number:>3}  windows {first}–{last}  measures {start}–{end}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,397 @@
+"""Serves analyses on localhost, streaming the magnitudes and phases of the windows as they are computed.
+
+A response of /analyze is newline-delimited JSON sent in chunks: a 'start' line with the settings, one 'windows'
+line per chunk of windows, and an 'end' line, or an 'error' line if the analysis failed. Scores are parsed in a
+pool of worker processes that import music21 as they start, so no parse waits for the import and the event loop
+never waits for a parse. Identical requests share one analysis while it runs, and the most recent
+finished analyses are sent again without computing them.
+
+Example:
+    python DFT_Server.py --port 8765
+    curl -N 'http://127.0.0.1:8765/analyze?repertoire=sample_corpus/MessiaenTheme.xml&window=16&strategy=Onset'
+    curl -N -d '{"repertoire" : "bach/bwv244.10.mxl", "excerpt" : [1, 8], "window" : 4}' http://127.0.0.1:8765/analyze
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict
+from urllib.parse import parse_qsl, urlsplit
+
+import DFT_Cache as Cache
+import DFT_Config as Config
+import DFT_Corpus as CP
+import DFT_Functions as Funcs
+
+
+reasons = {200 : 'OK', 400 : 'Bad Request', 404 : 'Not Found', 405 : 'Method Not Allowed',
+           413 : 'Payload Too Large', 500 : 'Internal Server Error'}
+
+# largest request body read, in bytes
+max_body_bytes = 65536
+
+
+class request_error(Exception):
+    """Ends a request with an HTTP error status and a JSON message."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def warm_worker():
+    """Imports music21 in a new worker process, before the worker takes its first parse."""
+    from music21 import converter, corpus, meter  # noqa: F401
+
+    Funcs.meter_sequence('4/4')
+
+
+def load_in_worker(config, use_cache):
+    """Gets the score data of a config in a worker process, from the cache or by parsing the score."""
+    return Funcs.load_score_data(
+        repertoire=config.repertoire,
+        excerpt=config.excerpt,
+        strat=config.strategy,
+        use_cache=use_cache)
+
+
+def next_message(chunks):
+    """Computes the next chunk of windows and lays it out as a 'windows' message, or returns None at the end."""
+    chunk = next(chunks, None)
+    if chunk is None:
+        return None
+    return {'event' : 'windows',
+            'first_window' : int(chunk.first_window),
+            'measure_ranges' : chunk.measure_ranges.tolist(),
+            'magnitudes' : chunk.magnitudes.tolist(),
+            'phases' : chunk.phases.tolist()}
+
+
+def config_from_values(values):
+    """Builds an analysis_config from query parameters or a JSON object.
+
+    Query parameters are strings: the excerpt is written as e.g. '10-30', the coefficients as '1,3,5', and log as
+    'true' or 'false'.
+
+    Arguments:
+        values {dict} -- any of the fields of DFT_Config.analysis_config
+
+    Returns:
+        analysis_config -- the config
+    """
+    values = dict(values)
+    for name in ('excerpt', 'coefficients'):
+        if isinstance(values.get(name), str):
+            values[name] = [int(v) for v in re.split(r'[-,\s]+', values[name].strip()) if v] or None
+    if isinstance(values.get('log'), str):
+        if values['log'].lower() not in ('true', 'yes', '1', 'false', 'no', '0'):
+            raise ValueError(f"log must be true or false, got {values['log']!r}")
+        values['log'] = values['log'].lower() in ('true', 'yes', '1')
+    return Config.analysis_config.from_dict(values)
+
+
+class analysis_job(object):
+    """One analysis, whose messages are kept so that every client asking for it receives all of them."""
+    def __init__(self):
+        self.lines = []
+        self.done = False
+        self.changed = asyncio.Condition()
+        self.task = None
+
+    async def add(self, message):
+        async with self.changed:
+            self.lines.append((json.dumps(message) + '\n').encode())
+            self.done = message['event'] in ('end', 'error')
+            self.changed.notify_all()
+
+    async def follow(self):
+        """Yields every message line, waiting for the ones not computed yet."""
+        sent = 0
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: sent < len(self.lines) or self.done)
+                new_lines = self.lines[sent:]
+            for line in new_lines:
+                yield line
+            sent += len(new_lines)
+            if self.done and sent == len(self.lines):
+                return
+
+
+class analysis_server(object):
+    """HTTP server for analyses on localhost.
+
+    Routes: GET /health, GET /corpus (the pieces of DFT_Corpus), GET /status (counts of requests and analyses),
+    and GET or POST /analyze, which takes the fields of DFT_Config.analysis_config (and chunk_size) as query
+    parameters or a JSON object and streams the results.
+
+    Keyword Arguments:
+        host {string} -- address to listen on (default: {'127.0.0.1'})
+        port {int} -- port to listen on; 0 picks a free port, see .port (default: {8765})
+        workers {int} -- number of worker processes that parse scores (default: {None}, which uses one per CPU)
+        chunk_size {int} -- windows per 'windows' message, unless a request asks otherwise (default: {256})
+        use_cache {bool} -- reuse scores stored by DFT_Cache (default: {True})
+        any_file {bool} -- also analyze score files that are not in DFT_Corpus (default: {False})
+        max_finished {int} -- finished analyses kept to send again (default: {None}, which uses
+            DFT_Cache.max_memory_entries)
+    """
+    def __init__(self, host='127.0.0.1', port=8765, workers=None, chunk_size=256, use_cache=True, any_file=False,
+                 max_finished=None):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.use_cache = use_cache
+        self.any_file = any_file
+        self.jobs = {}
+        self.finished = Cache.memory_cache(max_finished)
+        self.counts = {'requests' : 0, 'analyses' : 0, 'shared' : 0, 'replayed' : 0}
+        self.server = None
+
+    async def start(self):
+        """Makes the pool of worker processes, each of which imports music21 as it starts, and starts listening."""
+        # spawned workers do not inherit the event loop or the threads of this process
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=warm_worker)
+        self.threads = ThreadPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for job in list(self.jobs.values()):
+            job.task.cancel()
+        self.threads.shutdown(wait=False)
+        self.pool.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def allowed(self, repertoire):
+        if repertoire in CP.full_corpus or repertoire in CP.music21_corpus:
+            return True
+        return self.any_file and os.path.isfile(repertoire)
+
+    async def handle(self, reader, writer):
+        try:
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    return
+                method, path, query, body = request
+                self.counts['requests'] += 1
+                if path == '/analyze':
+                    await self.analyze(writer, method, query, body)
+                elif method != 'GET':
+                    raise request_error(405, f'{method} is not supported for {path}')
+                elif path == '/health':
+                    await send_json(writer, 200, {'status' : 'ok'})
+                elif path == '/corpus':
+                    await send_json(writer, 200, {'corpus' : CP.full_corpus})
+                elif path == '/status':
+                    await send_json(writer, 200, dict(self.counts, running=len(self.jobs),
+                                                      finished=len(self.finished), workers=self.workers))
+                else:
+                    raise request_error(404, f'no route {path}')
+            except request_error as error:
+                await send_json(writer, error.status, {'error' : str(error)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # the client went away; a shared analysis carries on for the others
+            pass
+        finally:
+            writer.close()
+
+    async def analyze(self, writer, method, query, body):
+        if method == 'POST':
+            try:
+                values = json.loads(body or b'{}')
+            except ValueError as error:
+                raise request_error(400, f'body is not JSON: {error}')
+            if not isinstance(values, dict):
+                raise request_error(400, 'body must be a JSON object')
+        elif method == 'GET':
+            values = dict(query)
+        else:
+            raise request_error(405, f'{method} is not supported for /analyze')
+        try:
+            chunk_size = int(values.pop('chunk_size', self.chunk_size))
+            if chunk_size < 1:
+                raise ValueError(f'chunk_size must be at least 1, got {chunk_size}')
+            config = config_from_values(values)
+        except (TypeError, ValueError) as error:
+            raise request_error(400, str(error))
+        if not self.allowed(config.repertoire):
+            raise request_error(404, f'{config.repertoire!r} is not in DFT_Corpus')
+
+        key = json.dumps([asdict(config), chunk_size], sort_keys=True)
+        job = self.finished.get(key)
+        if job is not None:
+            self.counts['replayed'] += 1
+            source = 'replayed'
+        elif key in self.jobs:
+            job = self.jobs[key]
+            self.counts['shared'] += 1
+            source = 'shared'
+        else:
+            job = self.jobs[key] = analysis_job()
+            job.task = asyncio.ensure_future(self.run_job(key, job, config, chunk_size))
+            self.counts['analyses'] += 1
+            source = 'new'
+
+        writer.write(('HTTP/1.1 200 OK\r\n'
+                      'Content-Type: application/x-ndjson\r\n'
+                      'Transfer-Encoding: chunked\r\n'
+                      f'X-Analysis: {source}\r\n'
+                      'Connection: close\r\n\r\n').encode())
+        async for line in job.follow():
+            writer.write(b'%x\r\n%s\r\n' % (len(line), line))
+            await writer.drain()
+        writer.write(b'0\r\n\r\n')
+        await writer.drain()
+
+    async def run_job(self, key, job, config, chunk_size):
+        """Parses the score in a worker process, then computes the windows chunk by chunk in a thread and adds a
+        message for each chunk as soon as it is done."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            await job.add({'event' : 'start', 'config' : asdict(config), 'chunk_size' : chunk_size})
+            score_data = await loop.run_in_executor(self.pool, load_in_worker, config, self.use_cache)
+            chunks = Funcs.iter_sliding_window(
+                events=score_data['events'],
+                measure_index=score_data['measure_index'],
+                beat_offset_list=score_data['beat_offsets'],
+                window_size=config.window,
+                strategy=config.strategy,
+                log=config.log,
+                edo=config.edo,
+                chunk_size=chunk_size,
+                coefficients=config.coefficients)
+            n_windows = 0
+            while True:
+                message = await loop.run_in_executor(self.threads, next_message, chunks)
+                if message is None:
+                    break
+                n_windows += len(message['magnitudes'])
+                await job.add(message)
+            await job.add({'event' : 'end', 'windows' : n_windows, 'seconds' : time.perf_counter() - start})
+            self.finished.put(key, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            await job.add({'event' : 'error', 'message' : f'{type(error).__name__}: {error}'})
+        finally:
+            del self.jobs[key]
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+
+async def read_request(reader):
+    """Reads the request line, headers, and body of one HTTP request.
+
+    Returns:
+        tuple -- (method, path, query parameters, body), or None if the connection closed first
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise request_error(400, 'malformed request line')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise request_error(400, 'malformed Content-Length')
+    if length > max_body_bytes:
+        raise request_error(413, f'body is larger than {max_body_bytes} bytes')
+    body = await reader.readexactly(length) if length > 0 else b''
+    url = urlsplit(target)
+    return method.upper(), url.path, dict(parse_qsl(url.query)), body
+
+
+async def send_json(writer, status, content):
+    body = json.dumps(content).encode()
+    writer.write((f'HTTP/1.1 {status} {reasons[status]}\r\n'
+                  'Content-Type: application/json\r\n'
+                  f'Content-Length: {len(body)}\r\n'
+                  'Connection: close\r\n\r\n').encode() + body)
+    await writer.drain()
+
+
+def request_analysis(config, host='127.0.0.1', port=8765, chunk_size=None, timeout=None):
+    """Asks a running server for an analysis and yields its messages as they arrive.
+
+    Arguments:
+        config {analysis_config, dict, or tuple} -- all user inputs; see DFT_Config.as_config
+
+    Keyword Arguments:
+        host {string} -- address of the server (default: {'127.0.0.1'})
+        port {int} -- port of the server (default: {8765})
+        chunk_size {int} -- windows per message (default: {None}, which uses the server's)
+        timeout {float} -- seconds to wait for the server (default: {None})
+
+    Yields:
+        dict -- the 'start', 'windows', and 'end' or 'error' messages
+    """
+    values = asdict(Config.as_config(config))
+    if chunk_size is not None:
+        values['chunk_size'] = chunk_size
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request('POST', '/analyze', body=json.dumps(values),
+                           headers={'Content-Type' : 'application/json'})
+        response = connection.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f'{response.status} {response.reason}: {response.read().decode()}')
+        for line in response:
+            yield json.loads(line)
+    finally:
+        connection.close()
+
+
+async def serve(**settings):
+    server = analysis_server(**settings)
+    await server.start()
+    print(f'serving on http://{server.host}:{server.port} with {server.workers} workers', flush=True)
+    await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--chunk-size', type=int, default=256, help='windows per streamed message')
+    parser.add_argument('--no-cache', action='store_true', help='always parse the scores')
+    parser.add_argument('--any-file', action='store_true', help='also analyze files that are not in DFT_Corpus')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(host=args.host, port=args.port, workers=args.workers, chunk_size=args.chunk_size,
+                          use_cache=not args.no_cache, any_file=args.any_file))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,10 @@
-import tkinter as tk
 import DFT_Corpus as Corpus
+from DFT_Config import analysis_config
 
 
 def make_rep_input(frame, row_idx, config):
+    import tkinter as tk
+
     tk.Label(frame, text="Select Repertoire:").grid(row=row_idx)
     rep_list = Corpus.full_corpus
     rep = tk.StringVar()
@@ -13,6 +15,8 @@ def make_rep_input(frame, row_idx, config):
 
 
 def make_excerpt_input(frame, row_idx, config):
+    import tkinter as tk
+
     measures = []
     def excerpt_box():
         if exc.get() == True:
@@ -40,6 +44,8 @@ def make_excerpt_input(frame, row_idx, config):
  
 
 def make_win_size_input(frame, row_idx, config):
+    import tkinter as tk
+
     tk.Label(frame, text="Window Size:").grid(row=row_idx, sticky='w')
     win_size = tk.IntVar()
     win_size.set(16)
@@ -49,6 +55,8 @@ def make_win_size_input(frame, row_idx, config):
 
 
 def make_strategy_input(frame, row_idx, config):
+    import tkinter as tk
+
     tk.Label(frame, text="PC Counting Strategy:").grid(row=row_idx, sticky='w')
     strats = ["Duration", "Onset", "Flat"]
     strat = tk.StringVar()
@@ -59,6 +67,8 @@ def make_strategy_input(frame, row_idx, config):
         
 
 def make_log_input(frame, row_idx, config):
+    import tkinter as tk
+
     log = tk.BooleanVar()
     log.set(True)
     log_select = tk.Checkbutton(frame, text="Weighted Values", variable=log)
@@ -67,6 +77,13 @@ def make_log_input(frame, row_idx, config):
 
 
 def get_user_input():
+    """Opens the Tk dialog and collects the user inputs.
+
+    Returns:
+        analysis_config -- all user inputs
+    """
+    import tkinter as tk
+
     config_list = []
     ui = tk.Tk()
     ui.title("DFT User Inputs")
@@ -79,6 +96,4 @@ def get_user_input():
     tk.Button(ui, text="Done", command=ui.destroy).grid(row=len(func_list))
     ui.mainloop()
 
-    return(dict(config_list))
-
-user_inputs = get_user_input()
\ No newline at end of file
+    return analysis_config.from_dict(dict(config_list))
\ No newline at end of file
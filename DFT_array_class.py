@@ -1,7 +1,11 @@
+from functools import lru_cache
+
 import numpy as np
 
 
 class dft_array(object):
+    __slots__ = ('original_array', 'measure_range', 'start_measure', 'end_measure', 'log_weight')
+
     def __init__(self, array, measure_range=None, log_weight=True):
         self.original_array = array
         self.measure_range = measure_range
@@ -28,4 +32,267 @@ class dft_array(object):
     def rounded_original_array(self):
         return np.around(self.original_array, decimals=2)
         
-    
\ No newline at end of file
+
+
+@lru_cache(maxsize=None)
+def dft_basis(edo, coefficients):
+    """Builds the columns of the DFT matrix for the requested coefficients only.
+
+    Arguments:
+        edo {int} -- number of pitches that equally divide the octave
+        coefficients {tuple} -- Fourier coefficients to compute
+
+    Returns:
+        numpy array -- read-only (edo x number of coefficients) complex array, same sign convention as np.fft.fft
+    """
+    basis = np.exp(-2j * np.pi * np.outer(np.arange(edo), coefficients) / edo)
+    basis.setflags(write=False)
+    return basis
+
+
+class dft_matrix(object):
+    """Holds every window of a piece as one (windows x 12) matrix and transforms all rows in a single FFT.
+
+    Indexing or iterating returns dft_array_view objects, so code written for a list of dft_array keeps working.
+    first_window is the window number of the first row, for matrices that hold one chunk of a longer piece.
+    Passing dtype=np.float32 halves the memory of the windows and the results.
+    Rows have edo pitch classes. Only the requested coefficients (by default 1 to edo // 2) are computed, with 
+    one multiply by a cached basis; the 12-EDO default uses np.fft so its results match dft_array exactly.
+    quant defaults to edo, so the phases are quantized to the positions of the pitch classes.
+    """
+    __slots__ = ('windows', 'measure_ranges', 'log_weight', 'quant', 'first_window', 'edo', 'coefficients', 
+                 '_magnitudes', '_phases')
+
+    def __init__(self, windows, measure_ranges, log_weight=True, quant=None, first_window=1, dtype=np.float64, 
+                 edo=12, coefficients=None):
+        self.edo = edo
+        self.coefficients = tuple(range(1, edo // 2 + 1)) if coefficients is None else tuple(coefficients)
+        self.windows = np.asarray(windows, dtype=dtype).reshape(-1, edo)
+        self.measure_ranges = np.asarray(measure_ranges, dtype=np.int32).reshape(-1, 2)
+        self.log_weight = log_weight
+        self.quant = edo if quant is None else quant
+        self.first_window = first_window
+        self._magnitudes = None
+        self._phases = None
+
+    def __len__(self):
+        return len(self.windows)
+
+    def window_numbers(self):
+        return np.arange(self.first_window, self.first_window + len(self))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('window index out of range')
+        return dft_array_view(self, idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield dft_array_view(self, idx)
+
+    def do_dft(self):
+        # np.fft.fft over the rows matches the per-window dft_array.do_dft bit for bit
+        if self.log_weight is True:
+            return np.fft.fft(np.log2(self.windows + 1), axis=1)
+        else:
+            return np.fft.fft(self.windows, axis=1)
+
+    def requested_coefficients(self):
+        """Computes only the requested Fourier coefficients of every window.
+
+        Returns:
+            numpy array -- (number of windows x number of coefficients) complex array
+        """
+        if self.edo == 12 and self.coefficients == (1, 2, 3, 4, 5, 6):
+            return self.do_dft()[:, 1:7]
+        weighted = np.log2(self.windows + 1) if self.log_weight is True else self.windows
+        return weighted @ dft_basis(self.edo, self.coefficients)
+
+    def _transform(self):
+        coefficients = self.requested_coefficients()
+        self._magnitudes = np.abs(coefficients).astype(self.windows.dtype, copy=False)
+        self._phases = np.angle(coefficients, deg=True).astype(self.windows.dtype, copy=False)
+
+    def reuse_results(self, source, offset):
+        """Copies the results of every row that equals row offset + i of source, and computes only the other rows.
+
+        Used for excerpts, whose windows are mostly windows of the whole piece.
+
+        Arguments:
+            source {dft_matrix} -- results with the same log weight, edo, and coefficients, e.g. for the whole piece
+            offset {int} -- row of source that lines up with the first row
+
+        Returns:
+            numpy array -- indices of the rows that were computed
+        """
+        if (source.log_weight, source.edo, source.coefficients) != (self.log_weight, self.edo, self.coefficients):
+            raise ValueError('can only reuse results with the same log weight, edo, and coefficients')
+        n_shared = max(min(len(self), len(source) - offset), 0) if offset >= 0 else 0
+        same = np.zeros(len(self), dtype=bool)
+        same[:n_shared] = np.all(self.windows[:n_shared] == source.windows[offset:offset + n_shared], axis=1)
+
+        shape = (len(self), len(self.coefficients))
+        magnitudes = np.empty(shape, dtype=self.windows.dtype)
+        phases = np.empty(shape, dtype=self.windows.dtype)
+        shared_rows = np.flatnonzero(same)
+        magnitudes[shared_rows] = source.magnitudes[offset + shared_rows]
+        phases[shared_rows] = source.phases[offset + shared_rows]
+
+        computed = np.flatnonzero(~same)
+        if len(computed):
+            rest = dft_matrix(self.windows[computed], self.measure_ranges[computed], log_weight=self.log_weight,
+                              dtype=self.windows.dtype, edo=self.edo, coefficients=self.coefficients)
+            magnitudes[computed] = rest.magnitudes
+            phases[computed] = rest.phases
+        self._magnitudes = magnitudes
+        self._phases = phases
+        return computed
+
+    def compute(self):
+        """Runs the DFT now instead of on the first use of magnitudes or phases, e.g. so a timed stage includes it.
+
+        Returns:
+            dft_matrix -- self
+        """
+        if self._magnitudes is None or self._phases is None:
+            self._transform()
+        return self
+
+    def read_only(self):
+        """Gives a copy that shares the windows and results of this matrix as read-only arrays, so results kept in 
+        DFT_Cache.memory can be handed to every caller without one changing them for the others.
+
+        Returns:
+            dft_matrix -- the copy, with the DFT already run
+        """
+        self.compute()
+        view = dft_matrix.__new__(dft_matrix)
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, np.ndarray):
+                value = value.view()
+                value.flags.writeable = False
+            setattr(view, name, value)
+        return view
+
+    @property
+    def magnitudes(self):
+        if self._magnitudes is None:
+            self._transform()
+        return self._magnitudes
+
+    @property
+    def phases(self):
+        if self._phases is None:
+            self._transform()
+        return self._phases
+
+    @property
+    def quantized_phases(self):
+        spacing = 360/self.quant
+        return np.around(self.phases/spacing) * spacing
+
+
+class part_matrix(object):
+    """Holds the windows of every part of a piece as one (parts x windows x edo) tensor next to the windows of all 
+    parts together.
+
+    The rows of every part are transformed together in one FFT by parts, a dft_matrix of (parts * windows) rows. 
+    total is the dft_matrix of the combined windows, the same as score_to_data gives. part(idx) returns the 
+    dft_matrix of one part, sharing the windows and results of parts.
+    """
+    __slots__ = ('parts', 'total', 'n_parts')
+
+    def __init__(self, part_windows, total_windows, measure_ranges, log_weight=True, quant=None, first_window=1, 
+                 dtype=np.float64, edo=12, coefficients=None):
+        part_windows = np.asarray(part_windows, dtype=dtype).reshape(-1, len(measure_ranges), edo)
+        self.n_parts = len(part_windows)
+        settings = dict(log_weight=log_weight, quant=quant, first_window=first_window, dtype=dtype, edo=edo, 
+                        coefficients=coefficients)
+        self.parts = dft_matrix(part_windows.reshape(-1, edo), np.tile(measure_ranges, (self.n_parts, 1)), **settings)
+        self.total = dft_matrix(total_windows, measure_ranges, **settings)
+
+    def __len__(self):
+        return len(self.total)
+
+    def compute(self):
+        """Runs the DFT of every part and of all parts together now, see dft_matrix.compute.
+
+        Returns:
+            part_matrix -- self
+        """
+        self.parts.compute()
+        self.total.compute()
+        return self
+
+    @property
+    def windows(self):
+        return self.parts.windows.reshape(self.n_parts, len(self), -1)
+
+    @property
+    def magnitudes(self):
+        return self.parts.magnitudes.reshape(self.n_parts, len(self), -1)
+
+    @property
+    def phases(self):
+        return self.parts.phases.reshape(self.n_parts, len(self), -1)
+
+    def part(self, idx):
+        """Gives the windows and results of one part.
+
+        Arguments:
+            idx {int} -- part number, counted from 0 in score order
+
+        Returns:
+            dft_matrix -- the windows of the part, whose results are views of those of all parts
+        """
+        if not -self.n_parts <= idx < self.n_parts:
+            raise IndexError('part index out of range')
+        rows = slice((idx % self.n_parts) * len(self), (idx % self.n_parts + 1) * len(self))
+        matrix = dft_matrix(self.parts.windows[rows], self.parts.measure_ranges[rows], log_weight=self.parts.log_weight, 
+                            quant=self.parts.quant, first_window=self.parts.first_window, 
+                            dtype=self.parts.windows.dtype, edo=self.parts.edo, coefficients=self.parts.coefficients)
+        matrix._magnitudes = self.parts.magnitudes[rows]
+        matrix._phases = self.parts.phases[rows]
+        return matrix
+
+
+class dft_array_view(dft_array):
+    """One window of a dft_matrix. It only stores the matrix and its row, and reads everything else from the matrix."""
+    __slots__ = ('matrix', 'idx')
+
+    def __init__(self, matrix, idx):
+        self.matrix = matrix
+        self.idx = idx
+
+    @property
+    def original_array(self):
+        return self.matrix.windows[self.idx]
+
+    @property
+    def measure_range(self):
+        return (self.start_measure, self.end_measure)
+
+    @property
+    def start_measure(self):
+        return int(self.matrix.measure_ranges[self.idx, 0])
+
+    @property
+    def end_measure(self):
+        return int(self.matrix.measure_ranges[self.idx, 1])
+
+    @property
+    def log_weight(self):
+        return self.matrix.log_weight
+
+    def mag_dict(self):
+        row = self.matrix.magnitudes[self.idx]
+        return {f'f{i}' : value for i, value in zip(self.matrix.coefficients, row)}
+
+    def phase_dict(self):
+        row = self.matrix.phases[self.idx]
+        return {f'f{i}' : value for i, value in zip(self.matrix.coefficients, row)}
@@ -0,0 +1,33 @@
+"""Checks that importing the modules stays fast and pulls in none of the heavy or GUI libraries."""
+import json
+import os
+import subprocess
+import sys
+
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# loaded only when a score is parsed, a DataFrame or plot is made, or the dialog is opened
+heavy_modules = ('music21', 'pandas', 'plotly', 'tkinter')
+
+# seconds; generous, since a fresh interpreter on a busy machine is slow, and importing music21 alone takes longer
+max_import_seconds = 3.0
+
+
+def import_in_fresh_interpreter(modules):
+    code = ('import json, sys, time; start = time.perf_counter(); '
+            f'[__import__(name) for name in {list(modules)!r}]; '
+            'print(json.dumps({"seconds" : time.perf_counter() - start, "modules" : sorted(sys.modules)}))')
+    output = subprocess.run([sys.executable, '-c', code], cwd=repo, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_imports_are_light():
+    result = import_in_fresh_interpreter(['DFT_Functions', 'DFT_Graphing', 'DFT_UserInputs'])
+    loaded = [name for name in heavy_modules if name in result['modules']]
+    assert loaded == [], f'importing the modules loaded {loaded}'
+
+
+def test_import_time():
+    result = import_in_fresh_interpreter(['DFT_Functions', 'DFT_Graphing', 'DFT_UserInputs'])
+    assert result['seconds'] < max_import_seconds, f"imports took {result['seconds']:.2f} s"
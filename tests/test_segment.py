@@ -0,0 +1,60 @@
+"""Checks that DFT_Segment puts its boundaries where the music changes, not every min_length windows."""
+import os
+import sys
+
+import numpy as np
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+
+import DFT_Segment as Segment
+from DFT_array_class import dft_matrix
+
+
+c_major = [0, 2, 4, 5, 7, 9, 11]
+g_major = [7, 9, 11, 0, 2, 4, 6]
+
+
+def modulating_windows(n_first=48, n_second=60, window=8, seed=0):
+    """Windows of window beats over random notes of C major for n_first beats, then of G major."""
+    rng = np.random.default_rng(seed)
+    beats = np.zeros((n_first + n_second, 12))
+    for beat in range(len(beats)):
+        scale = c_major if beat < n_first else g_major
+        beats[beat, rng.choice(scale, size=6)] += 1
+    sums = np.cumsum(np.vstack([np.zeros(12), beats]), axis=0)
+    windows = sums[window:] - sums[:-window]
+    starts = np.arange(len(windows))
+    return dft_matrix(windows, np.column_stack([starts // 4 + 1, (starts + window - 1) // 4 + 1]))
+
+
+def boundaries(segments):
+    return [first for _, first, _, _, _ in segments[1:]]
+
+
+def test_boundaries_at_the_modulation():
+    segments = Segment.find_segments(modulating_windows())
+    # windows 42 to 48 hold beats of both keys, and may make a segment of their own
+    assert boundaries(segments), segments
+    assert all(40 <= first <= 50 for first in boundaries(segments)), segments
+
+
+def test_chunks_give_the_same_segments():
+    windows = modulating_windows()
+    chunks = [dft_matrix(windows.windows[start:start + 10], windows.measure_ranges[start:start + 10],
+                         first_window=start + 1) for start in range(0, len(windows), 10)]
+    assert Segment.find_segments(chunks) == Segment.find_segments(windows)
+
+
+def test_boundaries_follow_the_score():
+    import DFT_Functions as Funcs
+
+    min_length = 8
+    for piece, measure in [('sample_corpus/MozartK157_expo.xml', 20), ('sample_corpus/MessiaenTheme.xml', None)]:
+        chunks = Funcs.score_to_chunks((os.path.join(repo, piece), None, 4, 'Onset', True), use_cache=False)
+        segments = Segment.find_segments(chunks, min_length=min_length)
+        firsts = boundaries(segments)
+        assert any((first - 1) % min_length for first in firsts), f'{piece} was cut every {min_length} windows'
+        if measure is not None:
+            # the move to the dominant
+            assert any(abs(start - measure) <= 1 for _, _, _, start, _ in segments[1:]), segments
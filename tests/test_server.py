@@ -0,0 +1,74 @@
+"""Checks that DFT_Server shares running analyses, replays finished ones, and refuses files outside the corpus."""
+import asyncio
+import os
+import shutil
+import sys
+
+import pytest
+
+repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo)
+
+import DFT_Cache as Cache
+import DFT_Server as Server
+
+
+piece = 'sample_corpus/MessiaenTheme.xml'
+config = {'repertoire' : piece, 'window' : 4, 'strategy' : 'Onset'}
+
+
+@pytest.fixture(autouse=True)
+def in_repo_with_temporary_cache(tmp_path, monkeypatch):
+    # the workers are spawned, so they read the cache location from the environment
+    monkeypatch.setenv('DFT_CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(Cache, 'cache_dir', str(tmp_path / 'cache'))
+    monkeypatch.chdir(repo)
+
+
+def with_server(check, **settings):
+    """Runs check(server, request) against a server on a free port, where request(config) gets the messages of an
+    analysis from a thread, so several requests can wait at once."""
+    async def run():
+        loop = asyncio.get_running_loop()
+        def request(config):
+            return loop.run_in_executor(None, lambda: list(Server.request_analysis(config, port=server.port,
+                                                                                    timeout=60)))
+        async with Server.analysis_server(port=0, workers=1, **settings) as server:
+            return await check(server, request)
+    return asyncio.run(run())
+
+
+def test_identical_requests_share_one_analysis():
+    async def check(server, request):
+        first, second = await asyncio.gather(request(config), request(config))
+        assert first == second
+        assert first[-1]['event'] == 'end', first[-1]
+        assert server.counts['analyses'] == 1
+        assert server.counts['shared'] == 1
+    with_server(check)
+
+
+def test_finished_analysis_is_replayed():
+    async def check(server, request):
+        first = await request(config)
+        again = await request(config)
+        assert again == first
+        assert server.counts['analyses'] == 1
+        assert server.counts['replayed'] == 1
+    with_server(check)
+
+
+def test_file_outside_the_corpus_is_refused(tmp_path):
+    outside = str(tmp_path / 'theme.xml')
+    shutil.copy(os.path.join(repo, piece), outside)
+
+    async def check(server, request):
+        with pytest.raises(RuntimeError, match='404'):
+            await request(dict(config, repertoire=outside))
+        assert server.counts['analyses'] == 0
+    with_server(check)
+
+    async def check_any_file(server, request):
+        messages = await request(dict(config, repertoire=outside))
+        assert messages[-1]['event'] == 'end', messages[-1]
+    with_server(check_any_file, any_file=True)